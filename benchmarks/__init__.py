@@ -0,0 +1 @@
+"""Benchmarks for `pydata_factory` package."""
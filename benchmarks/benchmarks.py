@@ -0,0 +1,95 @@
+"""
+Benchmarks for the profiling and the generation, run by asv.
+
+The `time_*` benchmarks measure the time, the `peakmem_*` ones the peak
+RSS and the `track_*` ones the rows per second.
+"""
+import timeit
+
+from pydata_factory.classes import GenModule
+from pydata_factory.columns import GenColumn
+from pydata_factory.data import GenData
+from pydata_factory.schema import Schema
+
+from .common import make_dataframe, make_schemas
+
+
+class ProfileSuite:
+    params = ([8, 32], [10_000, 100_000])
+    param_names = ["width", "rows"]
+
+    def setup(self, width, rows):
+        self.df = make_dataframe(width, rows)
+
+    def time_get_schema(self, width, rows):
+        Schema.get_schema(self.df, "bench")
+
+    def peakmem_get_schema(self, width, rows):
+        Schema.get_schema(self.df, "bench")
+
+    def track_get_schema_rows_per_second(self, width, rows):
+        seconds = timeit.timeit(
+            lambda: Schema.get_schema(self.df, "bench"), number=1
+        )
+        return rows / seconds
+
+    track_get_schema_rows_per_second.unit = "rows/s"
+
+
+class CodegenSuite:
+    params = ([8, 32], [1, 4])
+    param_names = ["width", "depth"]
+
+    def setup(self, width, depth):
+        self.schemas = make_schemas(width, 1, depth)
+
+    def time_gen_module(self, width, depth):
+        GenModule.generate(self.schemas, "pydata_factory_bench")
+
+
+class GenerateSuite:
+    params = (["factory", "vectorized"], [8, 32], [1, 3])
+    param_names = ["engine", "width", "depth"]
+
+    def setup(self, engine, width, depth):
+        # note: the factory engine creates one object per row
+        self.rows = 1_000 if engine == "factory" else 100_000
+        self.schemas = make_schemas(width, self.rows, depth)
+        GenModule.load(self.schemas)
+
+    def time_generate(self, engine, width, depth):
+        GenData.generate(self.schemas, engine=engine)
+
+    def peakmem_generate(self, engine, width, depth):
+        GenData.generate(self.schemas, engine=engine)
+
+    def track_generate_rows_per_second(self, engine, width, depth):
+        seconds = timeit.timeit(
+            lambda: GenData.generate(self.schemas, engine=engine), number=1
+        )
+        return self.rows * depth / seconds
+
+    track_generate_rows_per_second.unit = "rows/s"
+
+
+class StageSuite:
+    """
+    Time of each stage of the vectorized generation of one chunk: the
+    columns alone, and the columns assembled in a DataFrame.
+    """
+
+    params = ([8, 32], [100_000])
+    param_names = ["width", "rows"]
+
+    def setup(self, width, rows):
+        self.schemas = make_schemas(width, rows, 1)
+        self.schema = self.schemas["Table0"]
+        GenModule.load(self.schemas)
+
+    def time_generate_columns(self, width, rows):
+        GenColumn.generate_table(self.schema, 0, rows, rows, {})
+
+    def time_generate_chunk(self, width, rows):
+        GenData._generate_shard(
+            self.schemas, "Table0", 0, rows, rows, {}, "vectorized"
+        )
@@ -0,0 +1,92 @@
+"""
+Synthetic schemas for the benchmarks, built from the shapes of the test
+schemas.
+"""
+import copy
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pydata_factory.text import GenText
+
+SCHEMAS_DIR = Path(__file__).parent.parent / "tests" / "data" / "schemas"
+
+
+def get_attribute_templates() -> list:
+    """
+    Return the attributes of the test schemas, except the keys, with the
+    patterns given by their names made explicit.
+    """
+    templates = []
+
+    for schema_name in ["clients", "projects", "tasks", "fb2021"]:
+        with open(SCHEMAS_DIR / f"{schema_name}.json") as f:
+            schema = json.load(f)
+
+        for k_attr, v_attr in schema["attributes"].items():
+            if k_attr == "id" or v_attr.get("depends-on"):
+                continue
+
+            attr = copy.deepcopy(v_attr)
+            attr.pop("after", None)
+            attr.pop("count", None)
+
+            pattern = GenText.get_pattern(schema, k_attr)
+            if pattern and attr["dtype"] == "str":
+                attr["pattern"] = pattern
+
+            templates.append(attr)
+
+    return templates
+
+
+def make_schemas(width: int = 8, rows: int = 10_000, depth: int = 1) -> dict:
+    """
+    Create `depth` schemas, each one depending on the previous one, with
+    `width` attributes (besides the keys) and `rows` rows.
+    """
+    templates = get_attribute_templates()
+    schemas = {}
+
+    for i in range(depth):
+        name = f"Table{i}"
+        attrs: dict = {"id": {"dtype": "int", "min": 1, "count": rows}}
+
+        if i:
+            attrs["parent_id"] = {
+                "dtype": "int",
+                "min": 1,
+                "depends-on": f"Table{i - 1}.id",
+            }
+
+        for j in range(width):
+            attrs[f"attr_{j}"] = copy.deepcopy(templates[j % len(templates)])
+
+        schemas[name] = {
+            "name": name,
+            "physical-name": f"table{i}",
+            "attributes": attrs,
+        }
+
+    return schemas
+
+
+def make_dataframe(width: int = 8, rows: int = 10_000) -> pd.DataFrame:
+    """
+    Create a DataFrame with `width` columns of the profiled types, to
+    benchmark the profiling.
+    """
+    rng = np.random.default_rng(0)
+    columns = [
+        lambda: rng.integers(0, 1000, rows),
+        lambda: rng.lognormal(3, 1, rows),
+        lambda: rng.choice(["a", "b", "c", "d"], rows),
+        lambda: pd.to_datetime(
+            rng.integers(0, 10**18, rows, dtype=np.int64), unit="ns"
+        ),
+    ]
+    return pd.DataFrame(
+        {f"col_{j}": columns[j % len(columns)]() for j in range(width)}
+    )
@@ -0,0 +1,128 @@
+"""
+Module for the cache of profiles used to refresh the schemas.
+"""
+import json
+import os
+import threading
+from typing import Optional
+
+import pyarrow.parquet as pq
+import sqlalchemy as sqla
+
+from pydata_factory.config import CACHE_FILENAME
+from pydata_factory.profiler import TableProfile
+
+
+def normalize_fingerprint(fingerprint: dict) -> dict:
+    # note: compare the fingerprints as they are stored in the cache file
+    return json.loads(json.dumps(fingerprint, default=str))
+
+
+class ProfileCache:
+    """
+    Store the profiles of the sources by a fingerprint of their content,
+    so unchanged sources don't need to be read again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                content = f.read()
+                self.entries = json.loads(content)
+
+    @staticmethod
+    def load(target_dir: str) -> "ProfileCache":
+        return ProfileCache(f"{target_dir}/{CACHE_FILENAME}")
+
+    def get_entry(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return {
+            "fingerprint": entry["fingerprint"],
+            "profile": TableProfile.from_dict(entry["profile"]),
+        }
+
+    def get(self, key: str, fingerprint: dict) -> Optional[TableProfile]:
+        """
+        Return the cached profile, if the source didn't change.
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        if entry["fingerprint"] != normalize_fingerprint(fingerprint):
+            return None
+        return entry["profile"]
+
+    def set(self, key: str, fingerprint: dict, profile: TableProfile):
+        with self._lock:
+            self.entries[key] = {
+                "fingerprint": normalize_fingerprint(fingerprint),
+                "profile": profile.to_dict(),
+            }
+
+    def save(self):
+        with self._lock:
+            with open(self.path, "w") as f:
+                json.dump(self.entries, fp=f, indent=2)
+
+    @staticmethod
+    def get_parquet_fingerprint(path: str) -> dict:
+        """
+        Create the fingerprint of a parquet file from its size, its
+        modification time and the row group statistics of its footer,
+        without reading the data.
+        """
+        stat = os.stat(path)
+        metadata = pq.ParquetFile(path).metadata
+
+        row_groups = []
+        for i_rg in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i_rg)
+            columns = []
+            for i in range(row_group.num_columns):
+                stats = row_group.column(i).statistics
+                columns.append(
+                    None
+                    if stats is None
+                    else [
+                        stats.null_count,
+                        stats.min if stats.has_min_max else None,
+                        stats.max if stats.has_min_max else None,
+                    ]
+                )
+            row_groups.append([row_group.num_rows, columns])
+
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "row-groups": row_groups,
+        }
+
+    @staticmethod
+    def get_sql_fingerprint(
+        conn: sqla.engine.Connection,
+        table: sqla.Table,
+        key_column: Optional[str] = "id",
+        updated_column: Optional[str] = "updated_at",
+    ) -> dict:
+        """
+        Create the fingerprint of a table from its number of rows and the
+        max value of its key and update time columns, when the table has
+        them.
+        """
+        aggs = [sqla.func.count().label("count")]
+
+        for k, column in [
+            ("max-key", key_column),
+            ("max-updated", updated_column),
+        ]:
+            if column and column in table.columns:
+                aggs.append(sqla.func.max(table.columns[column]).label(k))
+
+        result = conn.execute(sqla.select(*aggs).select_from(table))
+        return dict(result.mappings().one())
@@ -1,7 +1,20 @@
 """
 Module for class factory generation.
 """
-import datetime
+import hashlib
+import json
+import sys
+import threading
+import types
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+from pydata_factory.columns import GenColumn
+from pydata_factory.config import DEFAULT_LOCALE, MODULE_CACHE_SIZE
+from pydata_factory.metrics import GenMetrics
+from pydata_factory.text import GenText
 
 
 class Model:
@@ -62,6 +75,85 @@ class GenFactory:
         "{attributes}\n\n"
     )
 
+    @staticmethod
+    def _get_numeric_value(col: dict) -> str:
+        """
+        Create the factory declaration for a numeric attribute, following
+        the same distribution used by `GenColumn.sample_numeric`.
+        """
+        is_int = col["dtype"] == "int"
+        v_min = col.get("min")
+        v_max = col.get("max")
+        v_min = 0 if v_min is None else v_min
+        v_max = 9999 if v_max is None else v_max
+
+        if v_min == v_max:
+            return str(v_min if is_int else float(v_min))
+
+        quantiles = col.get("quantiles")
+        mean = col.get("mean")
+        std = col.get("std")
+
+        if quantiles:
+            sample = (
+                f"GenColumn.inverse_cdf({tuple(quantiles)}, random.random())"
+            )
+        elif mean is not None and std:
+            sample = (
+                f"GenColumn.inverse_normal_cdf({mean}, {std}, "
+                f"{v_min}, {v_max}, random.random())"
+            )
+        elif is_int:
+            sample = f"random.randint({v_min}, {v_max})"
+        else:
+            sample = f"random.uniform({v_min}, {v_max})"
+
+        # note: the same placement of `GenColumn._apply_after`, from the
+        #       position of the sampled value in [min, max]
+        if col.get("after"):
+            sample = (
+                f"GenColumn.get_after_value(o.{col['after']}, {v_max}, "
+                f"GenColumn.get_position({sample}, {v_min}, {v_max}))"
+            )
+
+        func = "round" if is_int else "float"
+        return f"factory.LazyAttribute(lambda o: {func}({sample}))"
+
+    @staticmethod
+    def _get_datetime_value(col: dict) -> str:
+        """
+        Create the factory declaration for a date or datetime attribute,
+        keeping the time of the day and the time zone of the datetimes.
+        """
+        v_min, v_max = GenColumn._get_datetime_range(col)
+        d_min, d_max = pd.Timestamp(v_min), pd.Timestamp(v_max)
+
+        if col["dtype"] == "date":
+            return (
+                f"FuzzyDate(datetime.date({d_min.year}, {d_min.month}, "
+                f"{d_min.day}), datetime.date({d_max.year}, {d_max.month}, "
+                f"{d_max.day}))"
+            )
+
+        tz = GenColumn.get_datetime_tz(col)
+        tzinfo = ", tzinfo=datetime.timezone.utc" if tz else ""
+        start, end = [
+            f"datetime.datetime({d.year}, {d.month}, {d.day}, {d.hour}, "
+            f"{d.minute}, {d.second}, {d.microsecond}{tzinfo})"
+            for d in [d_min, d_max]
+        ]
+
+        # note: the datetimes are uniform in [min, max], so the position of
+        #       the value is uniform too (see `GenColumn._apply_after`)
+        if col.get("after"):
+            return (
+                "factory.LazyAttribute(lambda o: GenColumn.get_after_value("
+                f"o.{col['after']}, {end}, random.random()))"
+            )
+
+        fuzzy_class = "FuzzyDateTime" if tz else "FuzzyNaiveDateTime"
+        return f"{fuzzy_class}({start}, {end})"
+
     @staticmethod
     def generate(schema: dict, module: str, context_schemas: dict) -> str:
         """
@@ -90,20 +182,17 @@ class GenFactory:
                     t = "factory.Factory"
 
             elif k_attr == "id":
-                v_min = int(col.get("min", 1))
+                v_min = col.get("min")
+                v_min = 1 if v_min is None else int(v_min)
                 v = f"factory.Sequence(lambda n: n + {v_min})"
 
-            elif k_attr == "address":
-                v = "factory.Faker('address')"
-
-            elif k_attr == "name":
-                v = f"factory.Sequence(lambda n: f'{class_name}' + str(n))"
-
-            elif k_attr == "first_name":
-                v = "factory.Sequence(lambda n: f'FirstName{n}')"
-
-            elif k_attr == "last_name":
-                v = "factory.Sequence(lambda n: f'LastName{n}')"
+            elif GenText.get_pattern(schema, k_attr):
+                pattern = GenText.get_pattern(schema, k_attr)
+                locale = col.get("locale", DEFAULT_LOCALE)
+                v = (
+                    "factory.Sequence(lambda n: GenText.format_value("
+                    f"{pattern!r}, n, random, {locale!r}))"
+                )
 
             elif k_attr.endswith("_id") and v_attr.get("depends-on"):
                 t = "factory.Factory"
@@ -113,8 +202,10 @@ class GenFactory:
                     dep_attr
                 ]
 
-                id_min = dep_attr_ref.get("min", 1)
-                id_max = dep_attr_ref.get("max", 9999)
+                id_min = dep_attr_ref.get("min")
+                id_max = dep_attr_ref.get("max")
+                id_min = 1 if id_min is None else id_min
+                id_max = 9999 if id_max is None else id_max
 
                 v = (
                     f"factory.SubFactory('{module}.{dep_class}Factory', "
@@ -122,69 +213,32 @@ class GenFactory:
                     f"random.randint({id_min}, {id_max})))"
                 )
 
-            elif t == "int":
-                v_min = col.get("min", 0)
-                v_max = col.get("max", 9999)
-
-                if v_min == v_max:
-                    v = str(v_min)
-                else:
-                    v = (
-                        "factory.LazyAttribute(lambda o: "
-                        f"random.randint({v_min}, {v_max}))"
-                    )
-
-            elif t == "float":
-                v_min = int(col["min"])
-                v_max = int(col["max"])
-
-                if v_min == v_max:
-                    v = str(v_min)
-                else:
-                    v = (
-                        "factory.LazyAttribute(lambda o: 1.0 * "
-                        f"random.randint({v_min}, {v_max}))"
-                    )
+            elif t in ["int", "float"]:
+                v = GenFactory._get_numeric_value(col)
 
             elif t == "str":
 
                 if "categories" in col:
-                    options = tuple([(v, v) for v in col["categories"]])
-                    v = (
-                        "factory.Iterator({options}, " "getter=lambda c: c[0])"
-                    ).format(options=options)
+                    # note: the random generator is seeded for each block
+                    #       of rows, so it doesn't keep any state between
+                    #       shards
+                    options = tuple(col["categories"])
+                    if col.get("frequencies"):
+                        weights = tuple(col["frequencies"])
+                        v = (
+                            "factory.LazyAttribute(lambda o: random.choices("
+                            f"{options}, weights={weights})[0])"
+                        )
+                    else:
+                        v = (
+                            "factory.LazyAttribute(lambda o: "
+                            f"random.choice({options}))"
+                        )
                 else:
                     v = '""'
 
             elif t in ["date", "datetime"]:
-                v_min_str = str(col.get("min") or "")
-                v_max_str = str(col.get("max") or "")
-
-                dt_tmpl = "datetime.date({}, {}, {})"
-
-                dttm_tmpl = (
-                    "datetime.datetime({}, {}, {}, "
-                    "tzinfo=datetime.timezone.utc)"
-                )
-
-                if not v_min_str or not v_max_str:
-                    _now = datetime.datetime.now()
-                    dt_str = dt_tmpl.format(_now.year, _now.month, _now.day)
-                    v = f"FuzzyDate({dt_str})"
-                else:
-                    # note: add support for FuzzyDateTime as well
-                    _v_min = [int(v) for v in v_min_str[:10].split("-")]
-                    _v_max = [int(v) for v in v_max_str[:10].split("-")]
-
-                    start_date_str = dttm_tmpl.format(
-                        _v_min[0], _v_min[1], _v_min[2]
-                    )
-                    end_date_str = dttm_tmpl.format(
-                        _v_max[0], _v_max[1], _v_max[2]
-                    )
-                    fuzzy_class = "FuzzyDate"
-
-                    v = f"{fuzzy_class}({start_date_str}, {end_date_str})"
+                v = GenFactory._get_datetime_value(col)
 
             attributes.append(
                 GenFactory.ATTRIBUTE_TMPL.format(name=k_attr, value=v)
@@ -195,3 +249,99 @@ class GenFactory:
             attributes="\n".join(attributes),
             model_class=model_class,
         )
+
+
+class GenModule:
+    # note: the factories use the random generator of factory_boy, the
+    #       same used by the fuzzy attributes, that is reseeded for each
+    #       block of rows (see `GenSeed`)
+    HEADER = (
+        "from __future__ import annotations\n"
+        "import datetime\n"
+        "from dataclasses import dataclass\n\n"
+        "import factory\n"
+        "import factory.random\n"
+        "from factory.random import randgen as random\n"
+        "from factory.fuzzy import (\n"
+        "    FuzzyDate,\n"
+        "    FuzzyDateTime,\n"
+        "    FuzzyNaiveDateTime,\n"
+        ")\n"
+        "from faker import Faker\n\n"
+        "from pydata_factory.classes import Model\n"
+        "from pydata_factory.columns import GenColumn\n"
+        "from pydata_factory.text import GenText\n\n\n"
+    )
+
+    MODULE_TMPL = "pydata_factory_classes_{hash}"
+
+    _cache: "OrderedDict[str, types.ModuleType]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_hash(schemas: dict) -> str:
+        content = json.dumps(schemas, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def generate(schemas: dict, module: str) -> str:
+        """
+        Create the script with the class models and factories for all the
+        given schemas.
+        """
+        model_script = ""
+        factory_script = ""
+
+        for k_schema, schema in schemas.items():
+            model_script += GenModel.generate(schema) + "\n"
+            factory_script += (
+                GenFactory.generate(schema, module, schemas) + "\n"
+            )
+
+        return GenModule.HEADER + model_script + factory_script
+
+    @staticmethod
+    def load(
+        schemas: dict, metrics: Optional[GenMetrics] = None
+    ) -> types.ModuleType:
+        """
+        Compile the classes for the given schemas into an in-memory module.
+
+        The module is cached by the schemas hash, so the code generation
+        runs just once for the same schemas. It is also registered in
+        `sys.modules` because `factory.SubFactory` resolves the factories
+        by their import path. Just the last `MODULE_CACHE_SIZE` modules
+        used are kept, the evicted ones are removed from `sys.modules` too.
+        The time to generate and to compile the code is added to
+        `metrics`.
+        """
+        metrics = metrics if metrics is not None else GenMetrics()
+        module_name = GenModule.MODULE_TMPL.format(
+            hash=GenModule.get_hash(schemas)
+        )
+
+        with GenModule._lock:
+            if module_name in GenModule._cache:
+                GenModule._cache.move_to_end(module_name)
+                return GenModule._cache[module_name]
+
+            with metrics.stage("generate-code"):
+                script = GenModule.generate(schemas, module_name)
+
+            module = types.ModuleType(module_name)
+            sys.modules[module_name] = module
+            try:
+                with metrics.stage("compile-code"):
+                    code = compile(script, f"<{module_name}>", "exec")
+                    exec(code, module.__dict__)
+            except Exception:
+                del sys.modules[module_name]
+                raise
+
+            GenModule._cache[module_name] = module
+
+            while len(GenModule._cache) > MODULE_CACHE_SIZE:
+                evicted, _ = GenModule._cache.popitem(last=False)
+                sys.modules.pop(evicted, None)
+
+        return module
@@ -0,0 +1,413 @@
+"""
+Command line interface for PyData Factory.
+
+The heavy dependencies (pandas, sqlalchemy, factory_boy) are imported by
+each command, so `--help` starts fast.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+FORMATS = ["parquet", "csv", "sql"]
+
+
+def _parse_rows(values: Optional[List[str]]) -> dict:
+    rows = {}
+
+    for value in values or []:
+        name, sep, n_rows = value.partition("=")
+        if not sep or not n_rows.isdigit():
+            raise argparse.ArgumentTypeError(
+                f"Invalid rows: {value}. Use Name=N (e.g. Client=100)."
+            )
+        rows[name] = int(n_rows)
+
+    return rows
+
+
+def _get_config_extra(path: str, config_extra: Optional[str]) -> Optional[str]:
+    if config_extra:
+        return config_extra
+
+    # note: use the `__extra-config__.json` next to the schemas by default
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    default = os.path.join(directory, "__extra-config__.json")
+    return default if os.path.exists(default) else None
+
+
+def _get_priorities(
+    schemas: dict, config_file: Optional[str]
+) -> Optional[list]:
+    from pydata_factory.schema import Schema
+
+    priorities = Schema.get_priorities(config_file) if config_file else []
+
+    if not priorities:
+        return None
+
+    # note: the extra config can list schemas that were not given, and the
+    #       given schemas not listed are generated after the listed ones
+    return [k for k in priorities if k in schemas] + [
+        k for k in schemas if k not in priorities
+    ]
+
+
+def load_schemas(
+    paths: List[str], config_extra: Optional[str] = None
+) -> Tuple[dict, Optional[str]]:
+    """
+    Load the schemas from schema files, bundle files (`__schemas__.json`)
+    or directories with any of them, applying the extra config file.
+
+    It returns the schemas and the extra config file used.
+    """
+    from pydata_factory.config import BUNDLE_FILENAME
+    from pydata_factory.schema import Schema
+
+    schemas: dict = {}
+    config_file = None
+
+    for path in paths:
+        config_file = _get_config_extra(path, config_extra)
+
+        if os.path.isdir(path):
+            bundle_file = os.path.join(path, BUNDLE_FILENAME)
+            files = (
+                [bundle_file]
+                if os.path.exists(bundle_file)
+                else [
+                    os.path.join(path, f)
+                    for f in sorted(os.listdir(path))
+                    if f.endswith(".json") and not f.startswith("__")
+                ]
+            )
+        else:
+            files = [path]
+
+        for file in files:
+            if os.path.basename(file) == BUNDLE_FILENAME:
+                schemas.update(Schema.load_bundle(file, config_file))
+            else:
+                schema = Schema.load_file(file, config_file)
+                schemas[schema["name"]] = schema
+
+    return schemas, config_file
+
+
+class Progress:
+    """
+    Write the rows generated for each table to stderr, from the `shard`
+    events of `GenMetrics`.
+    """
+
+    def __init__(self, totals: Dict[str, int], quiet: bool = False):
+        self.totals = totals
+        self.done: Dict[str, int] = {}
+        self.quiet = quiet
+
+    def __call__(self, event: dict):
+        if event["stage"] != "shard" or self.quiet:
+            return
+
+        table = event["table"]
+        self.done[table] = self.done.get(table, 0) + event["rows"]
+        total = self.totals.get(table, 0)
+        percent = 100 * self.done[table] / total if total else 100.0
+
+        print(
+            f"{table}: {self.done[table]}/{total} rows ({percent:.0f}%)",
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+def profile(args: argparse.Namespace):
+    """
+    Create the schemas of a parquet file, a directory of parquet files or
+    a database. With `--partitioned`, the directory is one table with
+    partition files.
+    """
+    from pydata_factory.schema import Schema
+
+    options = dict(
+        namespace=args.namespace,
+        sample=args.sample,
+        max_rows=args.max_rows,
+        batch_size=args.batch_size,
+        cache=args.cache,
+    )
+
+    if "://" in args.source:
+        import sqlalchemy as sqla
+
+        engine = sqla.create_engine(args.source)
+        options["pushdown"] = args.pushdown
+
+        if args.table and len(args.table) == 1:
+            schemas = {}
+            schema = Schema.from_sql(
+                engine, args.table[0], args.target_dir, **options
+            )
+            schemas[schema["name"]] = schema
+        else:
+            schemas = Schema.from_database(
+                engine,
+                args.target_dir,
+                tables=args.table,
+                workers=args.workers,
+                **options,
+            )
+    elif os.path.isdir(args.source) and not args.partitioned:
+        options["footer_only"] = args.footer_only
+        schemas = Schema.from_parquet_dir(
+            args.source, args.target_dir, workers=args.workers, **options
+        )
+    else:
+        options["footer_only"] = args.footer_only
+        schema = Schema.from_parquet(args.source, args.target_dir, **options)
+        schemas = {schema["name"]: schema}
+
+    for k_schema, schema in schemas.items():
+        print(Schema.get_qualified_name(schema))
+
+
+def _write_csv(data, target_dir: str, metrics) -> Dict[str, str]:
+    paths: Dict[str, str] = {}
+
+    for qualified_name, df in data:
+        with metrics.stage("write", qualified_name, df.shape[0]):
+            is_new = qualified_name not in paths
+            paths[qualified_name] = f"{target_dir}/{qualified_name}.csv"
+            df.to_csv(
+                paths[qualified_name],
+                mode="w" if is_new else "a",
+                header=is_new,
+                index=False,
+            )
+
+    return paths
+
+
+def generate(args: argparse.Namespace):
+    """
+    Generate the data of the schemas, writing it to parquet or csv files,
+    or to a database.
+    """
+    from pydata_factory.config import DEFAULT_SEED
+    from pydata_factory.data import GenData
+    from pydata_factory.metrics import GenMetrics
+    from pydata_factory.schema import Schema
+
+    seed = DEFAULT_SEED if args.seed is None else args.seed
+    schemas, config_file = load_schemas(args.schemas, args.config_extra)
+    rows = _parse_rows(args.rows)
+    priorities = _get_priorities(schemas, config_file)
+
+    if args.dry_run:
+        estimate = GenData.estimate(
+            schemas,
+            rows=rows,
+            priorities=priorities,
+            engine=args.engine,
+            compact=args.compact,
+            seed=seed,
+            scale=args.scale,
+        )
+        print(json.dumps(estimate, indent=2))
+        return
+
+    names = {Schema.get_qualified_name(v): v["name"] for v in schemas.values()}
+    totals = GenData.get_rows(schemas, rows, args.scale)
+    progress = Progress(
+        {k: totals[name] for k, name in names.items()}, args.quiet
+    )
+    metrics = GenMetrics(callback=progress)
+    options = dict(
+        rows=rows,
+        priorities=priorities,
+        workers=args.workers,
+        seed=seed,
+        metrics=metrics,
+        scale=args.scale,
+    )
+
+    with metrics:
+        if args.format == "sql":
+            import sqlalchemy as sqla
+
+            if not args.url:
+                raise ValueError("--url is required with --format sql.")
+
+            GenData.to_sql(
+                sqla.create_engine(args.url),
+                schemas,
+                chunk_size=args.chunk_size,
+                if_exists=args.if_exists,
+                gen_engine=args.engine,
+                **options,
+            )
+        elif args.format == "parquet":
+            GenData.to_parquet(
+                schemas,
+                args.target_dir,
+                row_group_size=args.chunk_size,
+                engine=args.engine,
+                compact=args.compact,
+                **options,
+            )
+        else:
+            os.makedirs(args.target_dir, exist_ok=True)
+            _write_csv(
+                GenData.iter_generate(
+                    schemas,
+                    chunk_size=args.chunk_size,
+                    engine=args.engine,
+                    compact=args.compact,
+                    **options,
+                ),
+                args.target_dir,
+                metrics,
+            )
+
+    if not args.quiet:
+        print(f"total: {metrics.events[-1]['seconds']:.2f}s", file=sys.stderr)
+
+
+def export(args: argparse.Namespace):
+    """
+    Write the model and factory classes of the schemas as a Python module.
+    """
+    from pydata_factory.classes import GenModule
+
+    schemas, _ = load_schemas(args.schemas, args.config_extra)
+    module = args.module or os.path.splitext(os.path.basename(args.output))[0]
+
+    with open(args.output, "w") as f:
+        f.write(GenModule.generate(schemas, module))
+
+    print(args.output)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pydata-factory",
+        description="Create data for testing from data files.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # profile
+    p = subparsers.add_parser(
+        "profile",
+        help="create the schemas from parquet files or a database",
+    )
+    p.add_argument(
+        "source",
+        help="parquet file, directory of parquet files or database URL",
+    )
+    p.add_argument("target_dir", help="directory for the schema files")
+    p.add_argument("--namespace", default="")
+    p.add_argument(
+        "--table",
+        action="append",
+        help="table of the database to profile (default: all)",
+    )
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--sample", type=float, help="fraction of rows to read")
+    p.add_argument("--max-rows", type=int, help="max rows to read")
+    p.add_argument("--batch-size", type=int, default=100_000)
+    p.add_argument(
+        "--partitioned",
+        action="store_true",
+        help="profile the directory as one table with partition files",
+    )
+    p.add_argument(
+        "--footer-only",
+        action="store_true",
+        help="profile the parquet files just from their footers",
+    )
+    p.add_argument(
+        "--pushdown",
+        action="store_true",
+        help="compute the statistics in the database",
+    )
+    p.add_argument(
+        "--cache",
+        action="store_true",
+        help="reuse the profiles of the unchanged sources",
+    )
+    p.set_defaults(func=profile)
+
+    # generate
+    p = subparsers.add_parser(
+        "generate", help="generate the data of the schemas"
+    )
+    p.add_argument(
+        "schemas",
+        nargs="+",
+        help="schema files, bundle files or directories with them",
+    )
+    p.add_argument("--config-extra", help="extra config file")
+    p.add_argument("--target-dir", default=".", help="output directory")
+    p.add_argument("--format", choices=FORMATS, default="parquet")
+    p.add_argument("--url", help="database URL, for the sql format")
+    p.add_argument(
+        "--if-exists",
+        choices=["fail", "replace", "append"],
+        default="fail",
+    )
+    p.add_argument(
+        "--rows",
+        nargs="*",
+        help="rows of the tables, as Name=N (default: profiled counts)",
+    )
+    p.add_argument("--scale", type=float, default=1.0)
+    p.add_argument(
+        "--engine", choices=["factory", "vectorized"], default="vectorized"
+    )
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--chunk-size", type=int, default=98_304)
+    p.add_argument(
+        "--seed", type=int, help="seed of the data (default: DEFAULT_SEED)"
+    )
+    p.add_argument("--compact", action="store_true")
+    p.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="just print the estimated rows, bytes and seconds",
+    )
+    p.add_argument("--quiet", action="store_true", help="hide the progress")
+    p.set_defaults(func=generate)
+
+    # export
+    p = subparsers.add_parser(
+        "export", help="write the factory classes as a Python module"
+    )
+    p.add_argument(
+        "schemas",
+        nargs="+",
+        help="schema files, bundle files or directories with them",
+    )
+    p.add_argument("--config-extra", help="extra config file")
+    p.add_argument("--output", default="factories.py")
+    p.add_argument("--module", help="module name (default: output name)")
+    p.set_defaults(func=export)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        args.func(args)
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""
+Module for vectorized column generation.
+"""
+import datetime
+from statistics import NormalDist
+from typing import Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from pydata_factory.config import DEFAULT_LOCALE, DEFAULT_SEED
+from pydata_factory.seeds import GenSeed
+from pydata_factory.text import GenText
+
+
+class GenColumn:
+    # note: rounds of rejection for the truncated normal, the remaining
+    #       values are drawn from the uniform distribution
+    NORMAL_TRIES = 8
+
+    @staticmethod
+    def inverse_cdf(quantiles: Sequence[float], u):
+        """
+        Map uniform values in [0, 1] to the distribution given by its
+        evenly spaced quantiles, interpolating linearly between them.
+        """
+        return np.interp(u, np.linspace(0, 1, len(quantiles)), quantiles)
+
+    @staticmethod
+    def inverse_normal_cdf(
+        mean: float, std: float, v_min: float, v_max: float, u: float
+    ) -> float:
+        """
+        Map an uniform value in [0, 1] to the normal distribution
+        truncated to [v_min, v_max].
+        """
+        dist = NormalDist(mean, std)
+        p_min, p_max = dist.cdf(v_min), dist.cdf(v_max)
+        p = min(max(p_min + u * (p_max - p_min), 1e-12), 1 - 1e-12)
+        return min(max(dist.inv_cdf(p), v_min), v_max)
+
+    @staticmethod
+    def _truncated_normal(
+        mean: float,
+        std: float,
+        v_min: float,
+        v_max: float,
+        rows: int,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        values = rng.normal(mean, std, size=rows)
+
+        for _ in range(GenColumn.NORMAL_TRIES):
+            out = (values < v_min) | (values > v_max)
+            n_out = int(np.count_nonzero(out))
+            if not n_out:
+                return values
+            values[out] = rng.normal(mean, std, size=n_out)
+
+        out = (values < v_min) | (values > v_max)
+        values[out] = rng.uniform(v_min, v_max, size=int(out.sum()))
+        return values
+
+    @staticmethod
+    def sample_numeric(
+        col: dict, rows: int, rng: np.random.Generator
+    ) -> np.ndarray:
+        """
+        Draw the values of a numeric attribute following the distribution
+        recorded by the profiler.
+
+        It uses the `quantiles` (inverse transform sampling), otherwise a
+        normal distribution with `mean` and `std` truncated to
+        [`min`, `max`], otherwise the uniform distribution.
+        """
+        is_int = col["dtype"] == "int"
+        v_min = col.get("min")
+        v_max = col.get("max")
+        v_min = 0 if v_min is None else v_min
+        v_max = 9999 if v_max is None else v_max
+
+        if v_min == v_max:
+            return np.full(rows, v_min, dtype=np.int64 if is_int else float)
+
+        quantiles = col.get("quantiles")
+        mean = col.get("mean")
+        std = col.get("std")
+
+        if quantiles:
+            values = GenColumn.inverse_cdf(quantiles, rng.random(rows))
+        elif mean is not None and std:
+            values = GenColumn._truncated_normal(
+                mean, std, v_min, v_max, rows, rng
+            )
+        elif is_int:
+            return rng.integers(v_min, v_max, size=rows, endpoint=True)
+        else:
+            return rng.uniform(v_min, v_max, size=rows)
+
+        if is_int:
+            return np.clip(np.rint(values), v_min, v_max).astype(np.int64)
+        return values
+
+    @staticmethod
+    def get_datetime_tz(col: dict) -> Optional[str]:
+        """
+        Return the time zone of a datetime attribute, from its
+        `physical-dtype` (None when it is naive), UTC by default.
+        """
+        if col["dtype"] != "datetime":
+            return None
+
+        physical_dtype = col.get("physical-dtype")
+        if not physical_dtype:
+            return "UTC"
+
+        dtype = pd.api.types.pandas_dtype(physical_dtype)
+        return str(dtype.tz) if isinstance(dtype, pd.DatetimeTZDtype) else None
+
+    @staticmethod
+    def to_epoch_ns(value) -> int:
+        """
+        Convert a datetime to nanoseconds since the epoch, in UTC (naive
+        datetimes are taken as UTC).
+        """
+        value = pd.Timestamp(value)
+        if value.tzinfo is not None:
+            value = value.tz_convert("UTC").tz_localize(None)
+        return int(value.as_unit("ns").value)
+
+    @staticmethod
+    def _get_datetime_range(col: dict) -> tuple:
+        v_min = col.get("min")
+        v_max = col.get("max")
+
+        if not v_min or not v_max:
+            today = GenColumn.to_epoch_ns(datetime.date.today())
+            return today, today
+
+        return GenColumn.to_epoch_ns(v_min), GenColumn.to_epoch_ns(v_max)
+
+    @staticmethod
+    def get_position(x, v_min, v_max):
+        """
+        Return the relative position in [0, 1] of the values `x` in
+        [v_min, v_max].
+        """
+        span = max(v_max - v_min, 1)
+        return np.clip((x - v_min) / span, 0, 1)
+
+    @staticmethod
+    def get_after_value(lower, v_max, position):
+        """
+        Map the relative positions in [0, 1] to [lower, v_max], or to
+        `lower` when it is greater than `v_max`. It works with arrays and
+        with scalars (used by the factory classes for the `after`
+        attributes).
+        """
+        room = v_max - lower
+        zero = (
+            datetime.timedelta(0)
+            if isinstance(room, datetime.timedelta)
+            else 0
+        )
+        return lower + np.maximum(room, zero) * position
+
+    @staticmethod
+    def _apply_after(
+        col: dict, values: np.ndarray, lower: np.ndarray
+    ) -> np.ndarray:
+        """
+        Move the values of an attribute to [lower, max], keeping their
+        relative position in [min, max], so the attribute is never less
+        than the one in its `after` key.
+        """
+        is_datetime = values.dtype.kind == "M"
+
+        if is_datetime:
+            v_min, v_max = GenColumn._get_datetime_range(col)
+            x = values.view(np.int64)
+            lower = np.asarray(lower).astype(values.dtype).view(np.int64)
+        else:
+            v_min = col.get("min")
+            v_max = col.get("max")
+            v_min = 0 if v_min is None else v_min
+            v_max = 9999 if v_max is None else v_max
+            x = values
+
+        result = GenColumn.get_after_value(
+            lower, v_max, GenColumn.get_position(x, v_min, v_max)
+        )
+
+        if is_datetime:
+            return result.astype(np.int64).view(values.dtype)
+        if values.dtype.kind in "iu":
+            return np.rint(result).astype(values.dtype)
+        return result
+
+    @staticmethod
+    def sample_categories(
+        col: dict, rows: int, rng: np.random.Generator
+    ) -> pd.Categorical:
+        """
+        Draw the values of a categorical attribute, weighted by the
+        `frequencies` recorded by the profiler (uniform without them).
+
+        Just the category codes are drawn, so the values are not copied.
+        """
+        categories = col["categories"]
+        frequencies = col.get("frequencies")
+
+        p = None
+        if frequencies:
+            p = np.asarray(frequencies, dtype=np.float64)
+            p /= p.sum()
+
+        codes = rng.choice(len(categories), size=rows, p=p)
+        return pd.Categorical.from_codes(codes, categories=categories)
+
+    @staticmethod
+    def generate(
+        schema: dict,
+        k_attr: str,
+        rows: int,
+        rng: np.random.Generator,
+        start: int = 0,
+    ) -> Union[np.ndarray, pd.Categorical]:
+        """
+        Create the values of one attribute with a single vectorized call.
+
+        It follows the same rules used by `GenFactory.generate`, but it
+        fills the whole column at once instead of once per row. `start` is
+        the position of the first row, used by the sequences.
+        """
+        col = schema["attributes"][k_attr]
+        t = col["dtype"]
+
+        if k_attr == "id":
+            v_min = col.get("min")
+            v_min = 1 if v_min is None else int(v_min)
+            return np.arange(v_min + start, v_min + start + rows)
+
+        pattern = GenText.get_pattern(schema, k_attr)
+        if pattern:
+            return GenText.generate(
+                pattern,
+                rows,
+                rng,
+                start,
+                locale=col.get("locale", DEFAULT_LOCALE),
+            )
+
+        if t in ["int", "float"]:
+            return GenColumn.sample_numeric(col, rows, rng)
+
+        if t == "str":
+            if "categories" in col:
+                return GenColumn.sample_categories(col, rows, rng)
+            return np.full(rows, "", dtype=object)
+
+        if t == "date":
+            v_min, v_max = GenColumn._get_datetime_range(col)
+            day = 86_400 * 10**9
+            days = rng.integers(
+                v_min // day, v_max // day, size=rows, endpoint=True
+            )
+            return days.astype("datetime64[D]").astype("datetime64[ns]")
+
+        if t == "datetime":
+            # note: one int64 array of nanoseconds since the epoch, in UTC,
+            #       the time zone is set by `generate_table`
+            v_min, v_max = GenColumn._get_datetime_range(col)
+            values = rng.integers(v_min, v_max, size=rows, endpoint=True)
+            return values.view("datetime64[ns]")
+
+        return np.full(rows, None, dtype=object)
+
+    @staticmethod
+    def generate_table(
+        schema: dict,
+        start: int,
+        rows: int,
+        total: int,
+        fk_values: dict,
+        dtypes: Optional[dict] = None,
+        seed: int = DEFAULT_SEED,
+    ) -> dict:
+        """
+        Create all the attributes of a schema, except the ones with a
+        custom `__factory__`, as a dict of arrays, for the rows from
+        `start` to `start + rows` of a table with `total` rows.
+
+        Each attribute is drawn from its own random streams (see
+        `GenSeed`). The `depends-on` attributes are taken from
+        `fk_values`, already drawn from the foreign-key index. The
+        attributes with an `after` key are moved to be greater than or
+        equal to that attribute. Then each column is converted to its time
+        zone and to its dtype in `dtypes`.
+        """
+        data = {}
+        dtypes = dtypes or {}
+
+        for k_attr, v_attr in schema["attributes"].items():
+            if v_attr.get("__factory__"):
+                continue
+
+            if k_attr in fk_values:
+                data[k_attr] = fk_values[k_attr]
+                continue
+
+            data[k_attr] = GenSeed.generate(
+                seed,
+                schema["name"],
+                k_attr,
+                start,
+                rows,
+                total,
+                lambda block_rows, rng, block_start: GenColumn.generate(
+                    schema, k_attr, block_rows, rng, block_start
+                ),
+            )
+
+        for k_attr, v_attr in schema["attributes"].items():
+            after = v_attr.get("after")
+            if after in data and k_attr in data and k_attr not in fk_values:
+                data[k_attr] = GenColumn._apply_after(
+                    v_attr, data[k_attr], data[after]
+                )
+
+        for k_attr, values in data.items():
+            if k_attr in fk_values:
+                continue
+
+            tz = GenColumn.get_datetime_tz(schema["attributes"][k_attr])
+            if tz:
+                values = (
+                    pd.DatetimeIndex(values).tz_localize("UTC").tz_convert(tz)
+                )
+
+            if k_attr in dtypes:
+                values = pd.array(values, dtype=dtypes[k_attr], copy=False)
+
+            data[k_attr] = values
+
+        return data
@@ -1,7 +1,13 @@
+import sqlalchemy as sqla
+
 MAPS_FROM_PANDAS_TYPES = {
     "object": "str",
+    "str": "str",
+    "string": "str",
     "datetime64[ns, UTC]": "datetime",
     "datetime64[ns]": "datetime",
+    "datetime64[us, UTC]": "datetime",
+    "datetime64[us]": "datetime",
     "int64": "int",
     "int32": "int",
     "float64": "float",
@@ -9,9 +15,82 @@ MAPS_FROM_PANDAS_TYPES = {
 }
 
 
+# note: the order matters, the first matching class is used
+MAPS_FROM_SQL_TYPES = [
+    (sqla.Integer, "int64"),
+    (sqla.Float, "float64"),
+    (sqla.Numeric, "float64"),
+    (sqla.DateTime, "datetime64[ns]"),
+    (sqla.Date, "datetime64[ns]"),
+    (sqla.String, "object"),
+]
+
+
 MAPS_TO_PANDAS_TYPES = {
     "str": "object",
     "datetime": "datetime64[ns]",
     "int": "int64",
     "float": "float64",
 }
+
+
+# max number of distinct values tracked exactly when profiling a column
+MAX_CATEGORIES = 1000
+
+
+# number of values sampled when profiling a numeric column, used to
+# estimate its quantiles
+QUANTILE_SAMPLE_SIZE = 4096
+
+
+# number of quantiles recorded for a numeric column (from the min to the
+# max, evenly spaced)
+QUANTILES = 21
+
+
+# max number of parents whose children are counted when profiling a
+# foreign key, used to estimate its fan-out (see `FanOutSketch`)
+FAN_OUT_SAMPLE_SIZE = 4096
+
+
+# name of the file with all the schemas created from a database or a
+# directory
+BUNDLE_FILENAME = "__schemas__.json"
+
+
+# name of the file with the profiles cached by the fingerprint of their
+# sources
+CACHE_FILENAME = "__cache__.json"
+
+
+# max number of modules with the classes of the schemas kept in memory
+# (see `GenModule.load`)
+MODULE_CACHE_SIZE = 16
+
+
+# seed used when no seed is given to the generation
+DEFAULT_SEED = 42
+
+
+# number of rows of the blocks that have their own random streams (see
+# `GenSeed`), the chunk sizes should be multiples of it (the default chunk
+# size, 98_304, is 24 blocks)
+SEED_BLOCK_SIZE = 4096
+
+
+# locale used by Faker for the text attributes without `locale`
+DEFAULT_LOCALE = "en_US"
+
+
+# number of values created once per Faker provider and locale, sampled to
+# create the text attributes (see `GenText`)
+TEXT_POOL_SIZE = 1000
+
+
+# max number of distinct values of a unique key (see `GenKey`), so the
+# Feistel network fits in 64-bit integers
+MAX_KEY_SPACE = 2**62
+
+
+# number of rounds of the Feistel network that permutes the unique keys
+FEISTEL_ROUNDS = 4
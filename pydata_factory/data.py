@@ -1,135 +1,1072 @@
-import datetime
-import importlib
+import copy
+import math
 import os
-import random
-import sys
-from typing import Dict
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
 
 import factory
 import factory.random
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import sqlalchemy as sqla
 from faker import Faker
 
-from pydata_factory.classes import GenFactory, GenModel, Model
+from pydata_factory.classes import GenModule, Model
+from pydata_factory.columns import GenColumn
+from pydata_factory.config import DEFAULT_SEED
+from pydata_factory.keys import GenKey
+from pydata_factory.metrics import GenMetrics
 from pydata_factory.schema import Schema
+from pydata_factory.seeds import GenSeed
 
-Faker.seed(42)
-factory.random.reseed_random(42)
+ENGINES = ["factory", "vectorized"]
+
+MAPS_TO_SQL_TYPES = {
+    "str": sqla.Text,
+    "date": sqla.Date,
+    "datetime": sqla.DateTime,
+    "int": sqla.BigInteger,
+    "float": sqla.Float,
+}
 
 
 class GenData:
+    # note: the arrays of the fk index opened by a worker process, by path
+    #       (see `GenData._open_fk_index`)
+    _fk_arrays: Dict[str, np.ndarray] = {}
+
     @staticmethod
-    def _get_factory_extra(schema: dict, storage: dict) -> dict:
-        extra = {}
+    def _get_fk_keys(schemas: dict) -> Dict[str, set]:
+        """
+        Return the attributes, by class name, that are referenced by some
+        `depends-on` attribute.
+        """
+        fk_keys: Dict[str, set] = {}
+
+        for k_schema, schema in schemas.items():
+            for k_attr, v_attr in schema["attributes"].items():
+                if v_attr.get("depends-on"):
+                    dep_klass, dep_attr = v_attr.get("depends-on").split(".")
+                    fk_keys.setdefault(dep_klass, set()).add(dep_attr)
+
+        return fk_keys
+
+    @staticmethod
+    def _get_fk_values(
+        schema: dict,
+        start: int,
+        rows: int,
+        total: int,
+        fk_index: dict,
+        schemas: dict,
+        seed: int = DEFAULT_SEED,
+        parent_rows: Optional[Dict[str, np.ndarray]] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Draw the values for all the `depends-on` attributes at once.
+
+        The parent rows are sampled just once per parent class, so
+        attributes that depend on the same parent (e.g. `Project.id` and
+        `Project.client_id`) come from the same parent row. The parent
+        rows already given in `parent_rows` (by the unique keys, see
+        `GenKey`) are not sampled. When an attribute has a `fan-out`, the
+        number of children of each parent follows it, otherwise the
+        parents are uniform. When the parent was not generated, the
+        values are drawn from the range of the referenced attribute.
+        """
+        class_name = schema["name"]
+        fk_attrs: Dict[str, list] = {}
 
         for k_attr, v_attr in schema["attributes"].items():
             if v_attr.get("depends-on"):
                 dep_klass, dep_attr = v_attr.get("depends-on").split(".")
-                extra[k_attr] = random.choice(storage[dep_klass])[dep_attr]
+                fk_attrs.setdefault(dep_klass, []).append((k_attr, dep_attr))
+
+        values = {}
 
-        return extra
+        for dep_klass, attrs in fk_attrs.items():
+            if dep_klass not in fk_index:
+                for k_attr, dep_attr in attrs:
+                    dep_schema = next(
+                        v for v in schemas.values() if v["name"] == dep_klass
+                    )
+                    dep_attr_ref = dep_schema["attributes"][dep_attr]
+                    id_min = dep_attr_ref.get("min")
+                    id_max = dep_attr_ref.get("max")
+                    id_min = 1 if id_min is None else id_min
+                    id_max = 9999 if id_max is None else id_max
+                    values[k_attr] = GenSeed.generate(
+                        seed,
+                        class_name,
+                        k_attr,
+                        start,
+                        rows,
+                        total,
+                        lambda block_rows, rng, block_start: rng.integers(
+                            id_min,
+                            id_max,
+                            size=block_rows,
+                            endpoint=True,
+                        ),
+                    )
+                continue
+
+            index = fk_index[dep_klass]
+            n_parents = len(index[attrs[0][1]])
+
+            fan_out = next(
+                (
+                    schema["attributes"][k_attr]["fan-out"]
+                    for k_attr, _ in attrs
+                    if schema["attributes"][k_attr].get("fan-out")
+                ),
+                None,
+            )
+
+            if parent_rows and dep_klass in parent_rows:
+                dep_rows = parent_rows[dep_klass]
+            elif fan_out:
+                dep_rows = GenKey.get_fan_out_rows(
+                    fan_out,
+                    n_parents,
+                    start,
+                    rows,
+                    total,
+                    class_name,
+                    dep_klass,
+                    seed,
+                )
+            else:
+                dep_rows = GenSeed.generate(
+                    seed,
+                    class_name,
+                    f"depends-on:{dep_klass}",
+                    start,
+                    rows,
+                    total,
+                    lambda block_rows, rng, block_start: rng.integers(
+                        0, n_parents, size=block_rows
+                    ),
+                )
+
+            for k_attr, dep_attr in attrs:
+                values[k_attr] = index[dep_attr][dep_rows]
+
+        return values
 
     @staticmethod
-    def generate(
-        schemas: dict, rows: dict = {}, priorities: list = []
-    ) -> Dict[str, pd.DataFrame]:
+    def _reseed_factory(seed: int, class_name: str, block: int):
+        int_seed = GenSeed.get_int_seed(seed, class_name, "__factory__", block)
+        Faker.seed(int_seed)
+        factory.random.reseed_random(int_seed)
+
+    @staticmethod
+    def _generate_factory_fallback(
+        schema: dict,
+        data: dict,
+        start: int,
+        rows: int,
+        lib_tmp,
+        seed: int = DEFAULT_SEED,
+    ) -> dict:
         """
-        Generate fake data from a dataset file.
+        Fill the attributes with a custom `__factory__` using the factory
+        class, passing the vectorized values as overrides.
+
+        The factory random generator is seeded by the block of the first
+        row, so it is reproducible for the same chunks.
         """
+        attrs = [
+            k_attr
+            for k_attr, v_attr in schema["attributes"].items()
+            if v_attr.get("__factory__")
+        ]
 
-        tmp_dir = "/tmp/pydata_factory_classes"
-        os.makedirs(tmp_dir, exist_ok=True)
-        script_name = datetime.datetime.now().strftime("pydf_%Y%m%d_%H%M%S_%f")
-        script_path = f"{tmp_dir}/{script_name}.py"
-
-        header = (
-            "from __future__ import annotations\n"
-            "import datetime\n"
-            "from dataclasses import dataclass\n"
-            "import random\n\n"
-            "import factory\n"
-            "import factory.random\n"
-            "from factory.fuzzy import FuzzyDate, FuzzyDateTime\n"
-            "from faker import Faker\n\n"
-            "from pydata_factory.classes import Model\n\n"
-            "Faker.seed(42)\n"
-            "\n"
-            "factory.random.reseed_random(42)\n\n\n"
-        )
+        if not attrs:
+            return data
+
+        klass = getattr(lib_tmp, f"{schema['name']}Factory")
+        values: dict = {k_attr: [] for k_attr in attrs}
+
+        GenData._reseed_factory(seed, schema["name"], GenSeed.get_block(start))
+
+        for i in range(rows):
+            obj = klass(**{k: v[i] for k, v in data.items()})
+            for k_attr in attrs:
+                v = getattr(obj, k_attr)
+                values[k_attr].append(
+                    v.id if isinstance(v, Model) else v  # type: ignore
+                )
+
+        data = dict(data)
+        data.update(values)
+
+        # keep the same column order defined by the schema
+        return {k_attr: data[k_attr] for k_attr in schema["attributes"]}
+
+    @staticmethod
+    def _allocate_columns(dtypes: dict, rows: int) -> Dict[str, np.ndarray]:
+        """
+        Preallocate one array per attribute, to be filled in place row by
+        row. The attributes with a NumPy dtype are typed, the other ones
+        are stored as objects and converted once by `GenData._to_frame`.
+        """
+        columns = {}
+
+        for k_attr, dtype in dtypes.items():
+            dtype = pd.api.types.pandas_dtype(dtype)
+            if not isinstance(dtype, np.dtype) or dtype.kind not in "biufM":
+                dtype = np.dtype(object)
+            columns[k_attr] = np.empty(rows, dtype=dtype)
+
+        return columns
 
-        model_script = ""
-        factory_script = ""
+    @staticmethod
+    def _to_frame(data: dict, dtypes: dict) -> pd.DataFrame:
+        """
+        Build the DataFrame of a shard from its columns, in the order of
+        `dtypes`. Just the columns that are not in their dtype yet are
+        converted, and the arrays are not copied again.
+
+        There is no deduplication of the rows: the `id` attributes are
+        unique by construction, as they are a sequence in both engines,
+        and the declared unique keys are created by `GenKey`.
+        """
+        columns = {}
+
+        for k_attr, dtype in dtypes.items():
+            values = data[k_attr]
+            if getattr(values, "dtype", None) != dtype:
+                values = pd.array(values, dtype=dtype, copy=False)
+            # note: with an explicit dtype, pandas doesn't infer the string
+            #       dtype for the object columns
+            columns[k_attr] = pd.Series(values, dtype=dtype, copy=False)
+
+        return pd.DataFrame(columns, copy=False)
+
+    @staticmethod
+    def get_rows(
+        schemas: dict, rows: Optional[dict] = None, scale: float = 1.0
+    ) -> Dict[str, int]:
+        """
+        Return the number of rows to generate for each schema, by class
+        name: the ones given in `rows`, or the max `count` of its
+        attributes multiplied by `scale`.
+        """
+        rows = rows or {}
+        result = {}
 
         for k_schema, schema in schemas.items():
             name = schema["name"]
-            namespace = schema.get("namespace", "")
 
-            model_script += GenModel.generate(schema) + "\n"
-            factory_script += (
-                GenFactory.generate(schema, script_name, schemas) + "\n"
-            )
+            if rows.get(name):
+                result[name] = rows[name]
+                continue
 
-            if name not in rows or not rows[name]:
-                rows[name] = 1
-                for k, v in schema["attributes"].items():
-                    if "count" not in v:
-                        continue
-                    rows[name] = int(max(rows[name], v["count"]))
+            count = 1
+            for k, v in schema["attributes"].items():
+                if "count" not in v:
+                    continue
+                count = int(max(count, v["count"]))
 
-        script = model_script + factory_script
+            result[name] = max(int(round(count * scale)), 1)
 
-        with open(f"{tmp_dir}/__init__.py", "w") as f:
-            f.write("")
+        return result
 
-        with open(script_path, "w") as f:
-            f.write(header + script)
+    @staticmethod
+    def _scale_schemas(schemas: dict, rows: Dict[str, int]) -> dict:
+        """
+        Copy the schemas resized to the given number of rows.
+
+        The counts are multiplied by the ratio between the rows and the
+        profiled rows, the `id` attributes go from `min` to
+        `min + rows - 1`, and the ranges of the unique integer attributes
+        grow by the same ratio when they are smaller than the rows. The
+        fan-out of the foreign keys keeps its shape, as it is scaled to the
+        rows of each table (see `GenKey.get_fan_out_counts`).
+        """
+        profiled = GenData.get_rows(schemas)
+        result = {}
 
-        sys.path.insert(0, tmp_dir)
-        lib_tmp = importlib.import_module(script_name)
+        for k_schema, schema in schemas.items():
+            schema = copy.deepcopy(schema)
+            n_rows = rows[schema["name"]]
+            ratio = n_rows / profiled[schema["name"]]
 
-        dfs = {}
+            for k_attr, v_attr in schema["attributes"].items():
+                if v_attr.get("count") is not None:
+                    v_attr["count"] = int(round(v_attr["count"] * ratio))
 
-        if not priorities:
-            priorities = list(schemas.keys())
+                if v_attr["dtype"] != "int" or v_attr.get("depends-on"):
+                    continue
 
-        storage: dict = {}
+                if k_attr == "id":
+                    v_min = (
+                        1 if v_attr.get("min") is None else int(v_attr["min"])
+                    )
+                    v_attr["min"] = v_min
+                    v_attr["max"] = v_min + n_rows - 1
+                elif (
+                    v_attr.get("unique")
+                    and v_attr.get("min") is not None
+                    and v_attr.get("max") is not None
+                ):
+                    span = v_attr["max"] - v_attr["min"] + 1
+                    if span < n_rows:
+                        v_attr["max"] = (
+                            v_attr["min"] + math.ceil(span * ratio) - 1
+                        )
 
-        for k_schema in priorities:
-            schema = schemas[k_schema]
-            name = schema["name"]
-            physical_name = schema["physical-name"]
-            namespace = schema.get("namespace", "")
-            class_name = name
+            result[k_schema] = schema
+
+        return result
+
+    @staticmethod
+    def _generate_shard(
+        schemas: dict,
+        k_schema: str,
+        start: int,
+        rows: int,
+        total: int,
+        fk_index: dict,
+        engine: str,
+        compact: bool = False,
+        seed: int = DEFAULT_SEED,
+        metrics: Optional[GenMetrics] = None,
+    ) -> pd.DataFrame:
+        """
+        Generate the rows from `start` to `start + rows` for one schema
+        with `total` rows.
+
+        The random streams are keyed by the table, the attribute and the
+        block of rows (see `GenSeed`), so the result doesn't depend on
+        the chunk size, on which process generates it or on the order the
+        shards are generated. The time of each stage is added to
+        `metrics`.
+        """
+        schema = schemas[k_schema]
+        class_name = schema["name"]
+        table = Schema.get_qualified_name(schema)
+        metrics = metrics if metrics is not None else GenMetrics()
+        shard_start = time.perf_counter()
+
+        lib_tmp = GenModule.load(schemas, metrics)
 
-            storage[class_name] = []
+        # note: the factory engine creates again the rows of the first
+        #       block before `start`, as the factories share one random
+        #       stream per block
+        blocks = list(GenSeed.get_blocks(start, rows, total))
+        first_start = blocks[0][1] if blocks and engine == "factory" else start
 
-            df = Schema.to_dataframe(schema)
+        with metrics.stage("keys", table, rows):
+            key_values, parent_rows = GenKey.generate(
+                schema,
+                first_start,
+                start + rows - first_start,
+                total,
+                fk_index,
+                schemas,
+                seed,
+            )
+
+        with metrics.stage("fk-values", table, rows) as counters:
+            fk_values = GenData._get_fk_values(
+                schema,
+                first_start,
+                start + rows - first_start,
+                total,
+                fk_index,
+                schemas,
+                seed,
+                parent_rows,
+            )
+            fk_values.update(key_values)
+            for k_attr, v_attr in schema["attributes"].items():
+                if v_attr.get("depends-on"):
+                    dep_klass = v_attr["depends-on"].split(".")[0]
+                    k = "fk-index" if dep_klass in fk_index else "fk-range"
+                    counters[k] = counters.get(k, 0) + rows
 
-            physical_dtypes = {
-                k_attr: v_attr["physical-dtype"]
-                for k_attr, v_attr in schema["attributes"].items()
-                if v_attr.get("physical-dtype")
+        dtypes = Schema.get_column_dtypes(
+            schema, Schema.get_dtypes(schema, compact)
+        )
+
+        if engine == "vectorized":
+            with metrics.stage("columns", table, rows):
+                data = GenColumn.generate_table(
+                    schema,
+                    start,
+                    rows,
+                    total,
+                    fk_values,
+                    dtypes=dtypes,
+                    seed=seed,
+                )
+            with metrics.stage("factory-fallback", table, rows):
+                data = GenData._generate_factory_fallback(
+                    schema, data, start, rows, lib_tmp, seed
+                )
+        else:
+            klass = getattr(lib_tmp, f"{class_name}Factory")
+            data = GenData._allocate_columns(dtypes, rows)
+            # note: the attributes with a custom `__factory__` are not
+            #       overridden, as in `GenColumn.generate_table`
+            overrides = {
+                k: v
+                for k, v in fk_values.items()
+                if not schema["attributes"][k].get("__factory__")
             }
 
-            for i in range(rows[name]):
-                klass = getattr(lib_tmp, f"{class_name}Factory")
+            with metrics.stage("factory-rows", table, rows):
+                for block, block_start, block_rows in blocks:
+                    GenData._reseed_factory(seed, class_name, block)
+                    klass.reset_sequence(block_start, force=True)
+
+                    stop = min(start + rows, block_start + block_rows)
+
+                    for i in range(block_start, stop):
+                        obj = klass(
+                            **{
+                                k: v[i - first_start]
+                                for k, v in overrides.items()
+                            }
+                        )
+                        if i < start:
+                            continue
+
+                        for k_attr, values in data.items():
+                            v = getattr(obj, k_attr)
+                            values[i - start] = (
+                                v.id  # type: ignore
+                                if isinstance(v, Model)
+                                else v
+                            )
+
+        with metrics.stage("assembly", table, rows):
+            df = GenData._to_frame(data, dtypes)
+
+        metrics.add("shard", time.perf_counter() - shard_start, table, rows)
+
+        return df
+
+    @staticmethod
+    def _save_fk_index(
+        index: Dict[str, np.ndarray], directory: str, class_name: str
+    ) -> Dict[str, str]:
+        """
+        Write the fk index of one class to `.npy` files, returning their
+        paths by attribute.
+        """
+        paths = {}
+
+        for i, (k_attr, values) in enumerate(index.items()):
+            paths[k_attr] = os.path.join(directory, f"{class_name}-{i}.npy")
+            np.save(paths[k_attr], values, allow_pickle=values.dtype.hasobject)
+
+        return paths
+
+    @staticmethod
+    def _open_fk_index(fk_files: Dict[str, Dict[str, str]]) -> dict:
+        """
+        Open the fk index written by `GenData._save_fk_index`.
+
+        The arrays are memory mapped, so the workers share the same pages,
+        and each file is opened just once per process. The arrays of
+        Python objects (e.g. strings) can't be mapped and are read.
+        """
+        fk_index: dict = {}
+
+        for dep_klass, paths in fk_files.items():
+            fk_index[dep_klass] = {}
+
+            for k_attr, path in paths.items():
+                if path not in GenData._fk_arrays:
+                    try:
+                        array = np.load(path, mmap_mode="r")
+                    except ValueError:
+                        array = np.load(path, allow_pickle=True)
+                    GenData._fk_arrays[path] = array
+
+                fk_index[dep_klass][k_attr] = GenData._fk_arrays[path]
+
+        return fk_index
+
+    @staticmethod
+    def _run_shard(*task) -> Tuple[pd.DataFrame, GenMetrics]:
+        """
+        Generate a shard in a worker process, returning its metrics too.
+
+        The task has the paths of the fk index instead of the arrays (see
+        `GenData._open_fk_index`).
+        """
+        metrics = GenMetrics()
+        fk_index = GenData._open_fk_index(task[5])
+        task = task[:5] + (fk_index,) + task[6:]
+        return GenData._generate_shard(*task + (metrics,)), metrics
+
+    @staticmethod
+    def _map_shards(
+        tasks: Iterator[tuple],
+        executor: Optional[Executor],
+        window: int,
+        metrics: Optional[GenMetrics] = None,
+    ) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Generate the shards in order, keeping at most `window` shards in
+        flight when an executor is given.
+        """
+        if executor is None:
+            for task in tasks:
+                yield task[1], GenData._generate_shard(*task + (metrics,))
+            return
+
+        futures: deque = deque()
 
-                obj = klass(**GenData._get_factory_extra(schema, storage))
+        def get_result(future):
+            df, shard_metrics = future.result()
+            if metrics is not None:
+                metrics.merge(shard_metrics)
+            return df
 
-                data = obj.__dict__
-                data = {
-                    k: v.id if isinstance(v, Model) else v  # type: ignore
-                    for k, v in data.items()
+        for task in tasks:
+            futures.append(
+                (task[1], executor.submit(GenData._run_shard, *task))
+            )
+            if len(futures) >= window:
+                k_schema, future = futures.popleft()
+                yield k_schema, get_result(future)
+
+        while futures:
+            k_schema, future = futures.popleft()
+            yield k_schema, get_result(future)
+
+    @staticmethod
+    def iter_generate(
+        schemas: dict,
+        rows: Optional[dict] = None,
+        chunk_size: Optional[int] = 98_304,
+        priorities: Optional[list] = None,
+        engine: str = "factory",
+        workers: int = 1,
+        compact: bool = False,
+        seed: int = DEFAULT_SEED,
+        metrics: Optional[GenMetrics] = None,
+        scale: float = 1.0,
+    ) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Generate fake data in chunks of at most `chunk_size` rows.
+
+        It yields `(qualified_name, DataFrame)` for each chunk, table by
+        table, in topological order of the `depends-on` attributes, with
+        ties broken by `priorities`. Just the columns referenced by
+        `depends-on` attributes are kept in memory, so the child tables
+        can draw their foreign keys. If `chunk_size` is None, each table
+        is yielded in just one chunk.
+
+        With `workers` greater than 1, the chunks of the tables that don't
+        depend on each other are generated concurrently by a process pool.
+        The random streams are derived from `seed` for each table,
+        attribute and block of rows, so the result is the same for any
+        number of workers and chunk size.
+
+        With `compact`, the columns use the narrowest dtypes allowed by
+        the schemas (see `Schema.get_dtypes`). The time of each stage, by
+        table, is added to `metrics` (see `GenMetrics`).
+
+        `scale` multiplies the profiled rows of all the tables (the ones
+        not given in `rows`), and the schemas are resized to match (see
+        `GenData._scale_schemas`).
+        """
+        if engine not in ENGINES:
+            raise ValueError(
+                f"Invalid engine: {engine}. Options: {', '.join(ENGINES)}."
+            )
+        if scale <= 0:
+            raise ValueError(f"Invalid scale: {scale}.")
+
+        rows = GenData.get_rows(schemas, rows or {}, scale)
+        if scale != 1:
+            schemas = GenData._scale_schemas(schemas, rows)
+        metrics = metrics if metrics is not None else GenMetrics()
+
+        # note: build the classes before starting the workers
+        with metrics.stage("load-classes"):
+            GenModule.load(schemas, metrics)
+
+        fk_keys = GenData._get_fk_keys(schemas)
+        fk_index: dict = {}
+
+        executor = ProcessPoolExecutor(workers) if workers > 1 else None
+        # note: with workers, the fk index of each table is written just
+        #       once to files, and the tasks carry just their paths
+        fk_dir = (
+            tempfile.TemporaryDirectory(prefix="pydata_factory_")
+            if executor is not None
+            else None
+        )
+        fk_files: Dict[str, Dict[str, str]] = {}
+
+        try:
+            for level in Schema.get_levels(schemas, priorities or None):
+                tasks = []
+
+                for k_schema in level:
+                    n_rows = rows[schemas[k_schema]["name"]]
+                    step = chunk_size or n_rows
+
+                    # note: send to the workers just the parents' keys
+                    deps = {
+                        v_attr.get("depends-on").split(".")[0]
+                        for v_attr in schemas[k_schema]["attributes"].values()
+                        if v_attr.get("depends-on")
+                    }
+                    fk_parents = {
+                        k: v
+                        for k, v in (
+                            fk_files if executor is not None else fk_index
+                        ).items()
+                        if k in deps
+                    }
+
+                    for start in range(0, n_rows, step):
+                        tasks.append(
+                            (
+                                schemas,
+                                k_schema,
+                                start,
+                                min(step, n_rows - start),
+                                n_rows,
+                                fk_parents,
+                                engine,
+                                compact,
+                                seed,
+                            )
+                        )
+
+                fk_chunks: Dict[str, dict] = {
+                    schemas[k_schema]["name"]: {
+                        k_attr: []
+                        for k_attr in fk_keys.get(
+                            schemas[k_schema]["name"], []
+                        )
+                    }
+                    for k_schema in level
                 }
-                storage[class_name].append(data)
 
-            qualified_name = (
-                physical_name
-                if not namespace
-                else f"{namespace}.{physical_name}"
+                for k_schema, df in GenData._map_shards(
+                    iter(tasks), executor, 2 * workers, metrics
+                ):
+                    schema = schemas[k_schema]
+
+                    for k_attr, values in fk_chunks[schema["name"]].items():
+                        values.append(df[k_attr].to_numpy())
+
+                    yield Schema.get_qualified_name(schema), df
+
+                # note: store the referenced columns as contiguous arrays, so
+                #       the child tables can sample their foreign keys in
+                #       batch
+                for k_schema in level:
+                    schema = schemas[k_schema]
+                    chunks = fk_chunks[schema["name"]]
+
+                    with metrics.stage(
+                        "fk-index", Schema.get_qualified_name(schema)
+                    ):
+                        fk_index[schema["name"]] = {
+                            k_attr: np.ascontiguousarray(
+                                np.concatenate(values)
+                            )
+                            for k_attr, values in chunks.items()
+                        }
+                        if fk_dir is not None:
+                            fk_files[schema["name"]] = GenData._save_fk_index(
+                                fk_index[schema["name"]],
+                                fk_dir.name,
+                                schema["name"],
+                            )
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if fk_dir is not None:
+                fk_dir.cleanup()
+
+    @staticmethod
+    def generate(
+        schemas: dict,
+        rows: Optional[dict] = None,
+        priorities: Optional[list] = None,
+        engine: str = "factory",
+        workers: int = 1,
+        chunk_size: Optional[int] = 98_304,
+        compact: bool = False,
+        seed: int = DEFAULT_SEED,
+        metrics: Optional[GenMetrics] = None,
+        scale: float = 1.0,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Generate fake data from a dataset file.
+
+        `engine` can be "factory", that creates one object per row using
+        the generated factory_boy classes, or "vectorized", that fills each
+        column at once using NumPy. The tables are generated in shards of
+        `chunk_size` rows, by `workers` processes. With `compact`, the
+        columns use the narrowest dtypes allowed by the schemas. The same
+        `seed` always creates the same data (see `GenData.iter_generate`).
+        The time of each stage is added to `metrics`. `scale` multiplies
+        the profiled rows of all the tables (see `GenData.estimate` to
+        predict the size and the time before generating).
+        """
+        chunks: Dict[str, list] = {}
+
+        for qualified_name, df in GenData.iter_generate(
+            schemas,
+            rows=rows,
+            chunk_size=chunk_size,
+            priorities=priorities,
+            engine=engine,
+            workers=workers,
+            compact=compact,
+            seed=seed,
+            metrics=metrics,
+            scale=scale,
+        ):
+            chunks.setdefault(qualified_name, []).append(df)
+
+        return {
+            qualified_name: dfs[0]
+            if len(dfs) == 1
+            else pd.concat(dfs, ignore_index=True)
+            for qualified_name, dfs in chunks.items()
+        }
+
+    @staticmethod
+    def estimate(
+        schemas: dict,
+        rows: Optional[dict] = None,
+        priorities: Optional[list] = None,
+        engine: str = "factory",
+        compact: bool = False,
+        seed: int = DEFAULT_SEED,
+        scale: float = 1.0,
+        sample_rows: int = 10_000,
+    ) -> Dict[str, dict]:
+        """
+        Predict the rows, the bytes (in memory) and the seconds (in one
+        process) of each table, without generating all the data.
+
+        At most `sample_rows` rows of each table are generated, and their
+        bytes and time per row are multiplied by the rows of the table.
+        The other options are the same as in `GenData.generate`.
+        """
+        if scale <= 0:
+            raise ValueError(f"Invalid scale: {scale}.")
+
+        rows = GenData.get_rows(schemas, rows or {}, scale)
+        if scale != 1:
+            schemas = GenData._scale_schemas(schemas, rows)
+
+        sample = {k: min(v, sample_rows) for k, v in rows.items()}
+        names = {
+            Schema.get_qualified_name(v): v["name"] for v in schemas.values()
+        }
+        metrics = GenMetrics()
+        nbytes: Dict[str, int] = {}
+
+        for qualified_name, df in GenData.iter_generate(
+            schemas,
+            rows=sample,
+            chunk_size=None,
+            priorities=priorities,
+            engine=engine,
+            compact=compact,
+            seed=seed,
+            metrics=metrics,
+        ):
+            nbytes[qualified_name] = int(df.memory_usage(deep=True).sum())
+
+        tables = metrics.summary()["tables"]
+        result = {}
+
+        for qualified_name, sample_bytes in nbytes.items():
+            n_rows = rows[names[qualified_name]]
+            ratio = n_rows / sample[names[qualified_name]]
+            result[qualified_name] = {
+                "rows": n_rows,
+                "bytes": int(sample_bytes * ratio),
+                "seconds": tables[qualified_name]["stages"]["shard"] * ratio,
+            }
+
+        return result
+
+    @staticmethod
+    def _to_record_batch(
+        df: pd.DataFrame, categories: list, schema: Optional[pa.Schema]
+    ) -> pa.RecordBatch:
+        """
+        Convert a chunk to an arrow record batch, encoding the `categories`
+        columns as dictionary arrays.
+        """
+        batch = pa.RecordBatch.from_pandas(df, preserve_index=False)
+
+        if schema is None:
+            fields = [
+                pa.field(field.name, pa.dictionary(pa.int32(), pa.string()))
+                if field.name in categories
+                else field
+                for field in batch.schema
+            ]
+            schema = pa.schema(fields)
+
+        arrays = [
+            batch.column(i).cast(field.type) for i, field in enumerate(schema)
+        ]
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    @staticmethod
+    def to_parquet(
+        schemas: dict,
+        target_dir: str,
+        rows: Optional[dict] = None,
+        row_group_size: int = 98_304,
+        compression: str = "snappy",
+        priorities: Optional[list] = None,
+        engine: str = "factory",
+        workers: int = 1,
+        compact: bool = False,
+        seed: int = DEFAULT_SEED,
+        metrics: Optional[GenMetrics] = None,
+        scale: float = 1.0,
+    ) -> Dict[str, str]:
+        """
+        Generate fake data and write it to one parquet file per table.
+
+        Each chunk of `row_group_size` rows is converted to an arrow record
+        batch and written as a row group, so just one chunk per table is
+        kept in memory. The `categories` columns are dictionary encoded.
+        The chunks can be generated by `workers` processes, with `compact`
+        dtypes, from `seed`, with the rows multiplied by `scale`, adding
+        the time of each stage, including `write`, to `metrics` (see
+        `GenData.iter_generate`).
+        It returns the path of the file for each qualified name.
+        """
+        os.makedirs(target_dir, exist_ok=True)
+        metrics = metrics if metrics is not None else GenMetrics()
+
+        paths: Dict[str, str] = {}
+        writer: Optional[pq.ParquetWriter] = None
+        categories: list = []
+
+        try:
+            for qualified_name, df in GenData.iter_generate(
+                schemas,
+                rows=rows,
+                chunk_size=row_group_size,
+                priorities=priorities,
+                engine=engine,
+                workers=workers,
+                compact=compact,
+                seed=seed,
+                metrics=metrics,
+                scale=scale,
+            ):
+                if qualified_name not in paths:
+                    if writer is not None:
+                        writer.close()
+                        writer = None
+
+                    schema = next(
+                        v
+                        for v in schemas.values()
+                        if Schema.get_qualified_name(v) == qualified_name
+                    )
+                    categories = [
+                        k_attr
+                        for k_attr, v_attr in schema["attributes"].items()
+                        if v_attr.get("categories")
+                    ]
+                    paths[
+                        qualified_name
+                    ] = f"{target_dir}/{qualified_name}.parquet"
+
+                with metrics.stage("write", qualified_name, df.shape[0]):
+                    batch = GenData._to_record_batch(
+                        df, categories, writer.schema if writer else None
+                    )
+
+                    if writer is None:
+                        writer = pq.ParquetWriter(
+                            paths[qualified_name],
+                            batch.schema,
+                            compression=compression,
+                            use_dictionary=categories or False,
+                        )
+
+                    writer.write_batch(batch, row_group_size=row_group_size)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return paths
+
+    @staticmethod
+    def _get_sql_table(
+        schema: dict, metadata: sqla.MetaData, schemas: Optional[dict] = None
+    ) -> sqla.Table:
+        """
+        Create the table definition for a schema, using the physical names
+        of the table and its attributes, in the database schema of its
+        namespace, with its unique keys.
+
+        The `depends-on` attributes that reference a single-column key of
+        a schema in `schemas` get a foreign key to its qualified name.
+        """
+        map_attr = Schema.get_map_physical_attributes(schema)
+        columns = [
+            sqla.Column(map_attr[k_attr], MAPS_TO_SQL_TYPES[v_attr["dtype"]]())
+            for k_attr, v_attr in schema["attributes"].items()
+        ]
+
+        constraints: list = []
+        for key in GenKey.get_keys(schema):
+            names = [map_attr[k_attr] for k_attr in key]
+            if list(key) == schema.get("primary-key"):
+                constraints.append(sqla.PrimaryKeyConstraint(*names))
+            else:
+                constraints.append(sqla.UniqueConstraint(*names))
+
+        for k_attr, v_attr in schema["attributes"].items():
+            if not v_attr.get("depends-on"):
+                continue
+
+            dep_klass, dep_attr = v_attr["depends-on"].split(".")
+            dep_schema = next(
+                (
+                    v
+                    for v in (schemas or {}).values()
+                    if v["name"] == dep_klass
+                ),
+                None,
+            )
+
+            # note: the databases just accept foreign keys to unique keys
+            if dep_schema is None or (dep_attr,) not in GenKey.get_keys(
+                dep_schema
+            ):
+                continue
+
+            dep_column = Schema.get_map_physical_attributes(dep_schema)[
+                dep_attr
+            ]
+            constraints.append(
+                sqla.ForeignKeyConstraint(
+                    [map_attr[k_attr]],
+                    [f"{Schema.get_qualified_name(dep_schema)}.{dep_column}"],
+                )
+            )
+
+        return sqla.Table(
+            schema["physical-name"],
+            metadata,
+            *columns,
+            *constraints,
+            schema=schema.get("namespace") or None,
+        )
+
+    @staticmethod
+    def to_sql(
+        engine: sqla.engine.base.Engine,
+        schemas: dict,
+        rows: Optional[dict] = None,
+        chunk_size: int = 98_304,
+        batch_size: int = 10_000,
+        if_exists: str = "fail",
+        priorities: Optional[list] = None,
+        gen_engine: str = "factory",
+        workers: int = 1,
+        seed: int = DEFAULT_SEED,
+        metrics: Optional[GenMetrics] = None,
+        scale: float = 1.0,
+    ) -> Dict[str, int]:
+        """
+        Generate fake data and load it into a database.
+
+        The tables are written in topological order (see
+        `Schema.get_levels`), so the foreign keys are resolved, using just
+        one connection. Each chunk of `chunk_size`
+        rows is written in its own transaction, with multi-row inserts of
+        `batch_size` rows. `if_exists` can be "fail", "replace" or
+        "append", as in `pandas.DataFrame.to_sql`. `gen_engine` is the
+        engine used to generate the data, `workers` the number of
+        processes, `seed` the seed and `scale` the scale factor of the
+        rows (see `GenData.generate`). The time of each stage, including
+        `write`, is added to `metrics`.
+
+        It returns the number of rows written for each qualified name.
+        """
+        if if_exists not in ["fail", "replace", "append"]:
+            raise ValueError(f"Invalid if_exists: {if_exists}.")
+
+        metrics = metrics if metrics is not None else GenMetrics()
+        metadata = sqla.MetaData()
+        tables = {}
+
+        for k_schema, schema in schemas.items():
+            tables[Schema.get_qualified_name(schema)] = GenData._get_sql_table(
+                schema, metadata, schemas
             )
-            dfs[qualified_name] = pd.concat(
-                [df, pd.DataFrame(storage[class_name]).drop_duplicates()]
-            ).astype(physical_dtypes)
 
-        return dfs
+        written: Dict[str, int] = {}
+
+        with engine.connect() as conn:
+            with conn.begin():
+                inspector = sqla.inspect(conn)
+                existing = [
+                    table
+                    for table in tables.values()
+                    if inspector.has_table(table.name, schema=table.schema)
+                ]
+
+                if existing and if_exists == "fail":
+                    raise ValueError(
+                        f"Table '{existing[0].fullname}' already exists."
+                    )
+                if existing and if_exists == "replace":
+                    # note: the children are dropped before their parents
+                    metadata.drop_all(conn, tables=existing)
+
+                metadata.create_all(conn, checkfirst=True)
+
+            for qualified_name, df in GenData.iter_generate(
+                schemas,
+                rows=rows,
+                chunk_size=chunk_size,
+                priorities=priorities,
+                engine=gen_engine,
+                workers=workers,
+                seed=seed,
+                metrics=metrics,
+                scale=scale,
+            ):
+                with metrics.stage("write", qualified_name, df.shape[0]):
+                    table = tables[qualified_name]
+                    df.columns = [c.name for c in table.columns]
+                    records = df.astype(object).where(df.notna(), None)
+                    records = records.to_dict("records")
+
+                    with conn.begin():
+                        for i in range(0, len(records), batch_size):
+                            conn.execute(
+                                table.insert(), records[i : i + batch_size]
+                            )
+
+                written[qualified_name] = (
+                    written.get(qualified_name, 0) + df.shape[0]
+                )
+
+        return written
@@ -0,0 +1,361 @@
+"""
+Module for the generation of unique and composite keys.
+"""
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pydata_factory.columns import GenColumn
+from pydata_factory.config import (
+    DEFAULT_LOCALE,
+    DEFAULT_SEED,
+    FEISTEL_ROUNDS,
+    MAX_KEY_SPACE,
+)
+from pydata_factory.seeds import GenSeed
+from pydata_factory.text import GenText
+
+Domain = Tuple[List[int], Callable, Optional[str]]
+
+
+class GenKey:
+    """
+    Create the values of the unique keys of a schema.
+
+    A key is declared by the `unique` flag of an attribute, or by the
+    `primary-key` (a list of attributes) and `unique` (a list of lists of
+    attributes) of the schema. Each attribute of a key has a finite domain
+    (a range of integers or days, the categories, the parent rows or the
+    combinations of the fields of a text pattern), and the key is a
+    position in the mixed-radix product of these domains. The row `i` of
+    a table takes the position `permute(i)`, a bijection of the product
+    space, so the keys are unique across all the shards in O(rows),
+    without keeping the values already drawn.
+    """
+
+    @staticmethod
+    def get_keys(schema: dict) -> List[Tuple[str, ...]]:
+        keys = []
+
+        if schema.get("primary-key"):
+            keys.append(tuple(schema["primary-key"]))
+
+        for key in schema.get("unique", []):
+            keys.append(tuple(key))
+
+        for k_attr, v_attr in schema["attributes"].items():
+            if v_attr.get("unique"):
+                keys.append((k_attr,))
+
+        return list(dict.fromkeys(keys))
+
+    @staticmethod
+    def is_sequence(schema: dict, k_attr: str) -> bool:
+        """
+        Return if the attribute is unique by construction: the `id` and
+        the text patterns with the row number.
+        """
+        if k_attr == "id":
+            return True
+
+        pattern = GenText.get_pattern(schema, k_attr)
+        return bool(pattern) and any(
+            field == "n" for _, field, _ in GenText.parse(pattern)
+        )
+
+    @staticmethod
+    def _mix(x: np.ndarray, key: np.uint64) -> np.ndarray:
+        # note: splitmix64 finalizer, it wraps around on overflow
+        x = x ^ key
+        x *= np.uint64(0x9E3779B97F4A7C15)
+        x ^= x >> np.uint64(31)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(29)
+        return x
+
+    @staticmethod
+    def _feistel(x: np.ndarray, half: int, keys: np.ndarray) -> np.ndarray:
+        shift = np.uint64(half)
+        mask = np.uint64((1 << half) - 1)
+        left, right = x >> shift, x & mask
+
+        for key in keys:
+            f = GenKey._mix(right, key)
+            f &= mask
+            f ^= left
+            left, right = right, f
+
+        left <<= shift
+        left |= right
+        return left
+
+    @staticmethod
+    def permute(index: np.ndarray, size: int, keys: np.ndarray) -> np.ndarray:
+        """
+        Map the positions in [0, size) to a permutation of [0, size).
+
+        It is a balanced Feistel network over the smallest even number of
+        bits that holds `size`, with one round per item of `keys`. The
+        values out of the range are permuted again (cycle walking), less
+        than 4 times on average.
+        """
+        half = max(((size - 1).bit_length() + 1) // 2, 1)
+
+        x = GenKey._feistel(np.asarray(index, dtype=np.uint64), half, keys)
+        pending = np.flatnonzero(x >= np.uint64(size))
+
+        while len(pending):
+            v = GenKey._feistel(x[pending], half, keys)
+            x[pending] = v
+            pending = pending[v >= np.uint64(size)]
+
+        return x.astype(np.int64)
+
+    @staticmethod
+    def _get_round_keys(seed: int, class_name: str, key: str) -> np.ndarray:
+        return GenSeed.get_seed_sequence(
+            seed, class_name, key, 0
+        ).generate_state(FEISTEL_ROUNDS, dtype=np.uint64)
+
+    @staticmethod
+    def get_fan_out_counts(
+        fan_out: list, n_parents: int, total: int, rng: np.random.Generator
+    ) -> np.ndarray:
+        """
+        Draw the number of children of each parent from the quantiles of
+        the `fan-out`, scaled so they add up to `total`.
+        """
+        weights = GenColumn.inverse_cdf(fan_out, rng.random(n_parents))
+        weights = np.maximum(weights, 0)
+        if not weights.sum():
+            weights = np.ones(n_parents)
+
+        expected = weights * (total / weights.sum())
+        counts = np.floor(expected).astype(np.int64)
+
+        # note: the remaining rows go to the parents with the largest
+        #       fractional parts
+        remainder = total - int(counts.sum())
+        if remainder > 0:
+            top = np.argpartition(counts - expected, remainder - 1)
+            counts[top[:remainder]] += 1
+
+        return counts
+
+    @staticmethod
+    def get_fan_out_rows(
+        fan_out: list,
+        n_parents: int,
+        start: int,
+        rows: int,
+        total: int,
+        class_name: str,
+        dep_klass: str,
+        seed: int = DEFAULT_SEED,
+    ) -> np.ndarray:
+        """
+        Return the parent row of the rows from `start` to `start + rows` of
+        a table with `total` rows, following the `fan-out` of a foreign key.
+
+        The children of each parent are drawn once per table (the same
+        for all the shards), as `np.repeat(parents, counts)` permuted by
+        `GenKey.permute`. The repeated array is not created: the parent of
+        a row is found by a binary search on the cumulative counts.
+        """
+        key = f"fan-out:{dep_klass}"
+        counts = GenKey.get_fan_out_counts(
+            fan_out,
+            n_parents,
+            total,
+            GenSeed.get_rng(seed, class_name, key, 0),
+        )
+
+        position = GenKey.permute(
+            np.arange(start, start + rows),
+            total,
+            GenKey._get_round_keys(seed, class_name, key),
+        )
+        return np.searchsorted(np.cumsum(counts), position, side="right")
+
+    @staticmethod
+    def _get_int_domain(v_min: int, v_max: int) -> Domain:
+        return (
+            [v_max - v_min + 1],
+            lambda digits, rows: v_min + digits[0],
+            None,
+        )
+
+    @staticmethod
+    def get_domain(
+        schema: dict, k_attr: str, fk_index: dict, schemas: dict
+    ) -> Domain:
+        """
+        Return the sizes of the domain of an attribute, a function that
+        converts the positions in each domain to the values, and the class
+        name of the parent when the positions are the parent rows.
+        """
+        col = schema["attributes"][k_attr]
+        t = col["dtype"]
+
+        if col.get("depends-on"):
+            dep_klass, dep_attr = col["depends-on"].split(".")
+            dep_schema = next(
+                v for v in schemas.values() if v["name"] == dep_klass
+            )
+
+            if dep_klass not in fk_index:
+                dep_col = dep_schema["attributes"][dep_attr]
+                id_min = dep_col.get("min")
+                id_max = dep_col.get("max")
+                return GenKey._get_int_domain(
+                    1 if id_min is None else int(id_min),
+                    9999 if id_max is None else int(id_max),
+                )
+
+            parent_values = fk_index[dep_klass][dep_attr]
+
+            if GenKey.is_sequence(dep_schema, dep_attr) or dep_schema[
+                "attributes"
+            ][dep_attr].get("unique"):
+                return (
+                    [len(parent_values)],
+                    lambda digits, rows: parent_values[digits[0]],
+                    dep_klass,
+                )
+
+            distinct = np.unique(parent_values)
+            return (
+                [len(distinct)],
+                lambda digits, rows: distinct[digits[0]],
+                None,
+            )
+
+        pattern = GenText.get_pattern(schema, k_attr)
+        if pattern:
+            locale = col.get("locale", DEFAULT_LOCALE)
+            return (
+                GenText.get_sizes(pattern, locale),
+                lambda digits, rows: GenText.generate_unique(
+                    pattern, digits, rows, locale
+                ),
+                None,
+            )
+
+        if col.get("categories"):
+            categories = col["categories"]
+            return (
+                [len(categories)],
+                lambda digits, rows: pd.Categorical.from_codes(
+                    digits[0], categories=categories
+                ),
+                None,
+            )
+
+        if t == "int":
+            v_min = col.get("min")
+            v_max = col.get("max")
+            return GenKey._get_int_domain(
+                0 if v_min is None else int(v_min),
+                9999 if v_max is None else int(v_max),
+            )
+
+        if t == "date":
+            day = 86_400 * 10**9
+            v_min, v_max = GenColumn._get_datetime_range(col)
+            first_day, last_day = v_min // day, v_max // day
+            return (
+                [last_day - first_day + 1],
+                lambda digits, rows: (first_day + digits[0])
+                .astype("datetime64[D]")
+                .astype("datetime64[ns]"),
+                None,
+            )
+
+        raise ValueError(
+            f"Invalid attribute for a unique key: {schema['name']}.{k_attr}."
+        )
+
+    @staticmethod
+    def _limit_sizes(sizes: List[int]) -> List[int]:
+        # note: just the first values of the last domains are used when
+        #       the product space is greater than `MAX_KEY_SPACE`
+        limited = []
+        space = 1
+
+        for size in sizes:
+            size = max(min(size, MAX_KEY_SPACE // space), 1)
+            limited.append(size)
+            space *= size
+
+        return limited
+
+    @staticmethod
+    def generate(
+        schema: dict,
+        start: int,
+        rows: int,
+        total: int,
+        fk_index: dict,
+        schemas: dict,
+        seed: int = DEFAULT_SEED,
+    ) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """
+        Create the values of the unique keys of a schema, for the rows
+        from `start` to `start + rows` of a table with `total` rows.
+
+        It returns the values by attribute and the parent rows by class
+        name, for the keys with `depends-on` attributes, so the other
+        attributes that depend on the same parent come from the same row.
+        The keys with an attribute unique by construction are skipped.
+        """
+        values: Dict[str, Any] = {}
+        parent_rows: Dict[str, np.ndarray] = {}
+
+        for key in GenKey.get_keys(schema):
+            if any(GenKey.is_sequence(schema, k_attr) for k_attr in key):
+                continue
+
+            domains = [
+                GenKey.get_domain(schema, k_attr, fk_index, schemas)
+                for k_attr in key
+            ]
+            sizes = GenKey._limit_sizes(
+                [size for domain in domains for size in domain[0]]
+            )
+            space = math.prod(sizes)
+
+            if space < total:
+                raise ValueError(
+                    f"The unique key ({', '.join(key)}) of {schema['name']} "
+                    f"has {space} values, less than {total} rows."
+                )
+
+            round_keys = GenKey._get_round_keys(
+                seed, schema["name"], f"unique:{','.join(key)}"
+            )
+
+            index = GenKey.permute(
+                np.arange(start, start + rows), space, round_keys
+            )
+            digits = np.unravel_index(index, sizes)
+
+            i_digit = 0
+            for k_attr, (domain_sizes, decode, parent) in zip(key, domains):
+                if k_attr in values:
+                    raise ValueError(
+                        f"The attribute {schema['name']}.{k_attr} is in "
+                        "more than one unique key."
+                    )
+
+                attr_digits = list(
+                    digits[i_digit : i_digit + len(domain_sizes)]
+                )
+                i_digit += len(domain_sizes)
+
+                values[k_attr] = decode(attr_digits, rows)
+                if parent is not None:
+                    parent_rows[parent] = attr_digits[0]
+
+        return values, parent_rows
@@ -0,0 +1,146 @@
+"""
+Module for the metrics of the generation stages.
+"""
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # note: not available on Windows
+    resource = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+def get_peak_rss() -> Optional[int]:
+    """
+    Return the peak resident memory of the process, in bytes.
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # note: macos reports it in bytes, linux in kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class GenMetrics:
+    """
+    Collect the wall time of each stage of the generation, by table.
+
+    Each stage creates an event, a dict with `table`, `stage`, `seconds`,
+    `rows` and `peak-rss` (plus counters like `fk-index` and `fk-range`,
+    the number of foreign keys drawn from the parents and from the range
+    of the referenced attribute). The events are passed to `callback` and,
+    with `log`, written as JSON lines to the `pydata_factory.metrics`
+    logger.
+
+    Used as a context manager, it creates a `total` event for the whole
+    block::
+
+        with GenMetrics(callback=print) as metrics:
+            GenData.generate(schemas, metrics=metrics)
+        metrics.summary()
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[dict], None]] = None,
+        log: bool = False,
+    ):
+        self.callback = callback
+        self.log = log
+        self.events: List[dict] = []
+        self._start = 0.0
+
+    def __enter__(self) -> "GenMetrics":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.add("total", time.perf_counter() - self._start)
+
+    def add(
+        self,
+        stage: str,
+        seconds: float,
+        table: Optional[str] = None,
+        rows: int = 0,
+        **counters,
+    ):
+        event = {
+            "table": table,
+            "stage": stage,
+            "seconds": seconds,
+            "rows": rows,
+            "peak-rss": get_peak_rss(),
+        }
+        event.update(counters)
+        self.emit(event)
+
+    def emit(self, event: dict):
+        self.events.append(event)
+
+        if self.callback is not None:
+            self.callback(event)
+
+        if self.log:
+            logger.info(json.dumps(event))
+
+    @contextmanager
+    def stage(
+        self, stage: str, table: Optional[str] = None, rows: int = 0
+    ) -> Iterator[dict]:
+        """
+        Time a block of code as a stage. The yielded dict can be updated
+        with counters for the event.
+        """
+        counters: dict = {}
+        start = time.perf_counter()
+        yield counters
+        self.add(stage, time.perf_counter() - start, table, rows, **counters)
+
+    def merge(self, other: "GenMetrics"):
+        """
+        Emit the events collected by another instance (e.g. in a worker
+        process).
+        """
+        for event in other.events:
+            self.emit(event)
+
+    def summary(self) -> dict:
+        """
+        Return the seconds by stage, the rows, the rows per second (of
+        the `shard` stages) and the foreign keys drawn, by table, and the
+        peak resident memory.
+        """
+        tables: Dict[str, dict] = {}
+        peaks = [e["peak-rss"] for e in self.events if e["peak-rss"]]
+
+        for event in self.events:
+            table = tables.setdefault(
+                event["table"] or "*",
+                {"stages": {}, "rows": 0, "fk-index": 0, "fk-range": 0},
+            )
+            stages = table["stages"]
+            stages[event["stage"]] = (
+                stages.get(event["stage"], 0.0) + event["seconds"]
+            )
+
+            if event["stage"] == "shard":
+                table["rows"] += event["rows"]
+
+            for k in ["fk-index", "fk-range"]:
+                table[k] += event.get(k, 0)
+
+        for table in tables.values():
+            seconds = table["stages"].get("shard")
+            if seconds:
+                table["rows-per-second"] = table["rows"] / seconds
+
+        return {"tables": tables, "peak-rss": max(peaks, default=None)}
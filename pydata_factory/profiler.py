@@ -0,0 +1,731 @@
+"""
+Module for single-pass profiling of datasets.
+"""
+import base64
+from typing import Any, Dict, Iterable, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import sqlalchemy as sqla
+
+from pydata_factory.config import (
+    FAN_OUT_SAMPLE_SIZE,
+    MAPS_FROM_PANDAS_TYPES,
+    MAPS_FROM_SQL_TYPES,
+    MAX_CATEGORIES,
+    QUANTILE_SAMPLE_SIZE,
+    QUANTILES,
+)
+
+
+class HyperLogLog:
+    """
+    Estimate the number of distinct values with a fixed amount of memory.
+    """
+
+    def __init__(self, p: int = 12, registers: Optional[np.ndarray] = None):
+        self.p = p
+        self.registers = (
+            np.zeros(2**p, dtype=np.uint8)
+            if registers is None
+            else registers
+        )
+
+    @staticmethod
+    def _bit_length(values: np.ndarray) -> np.ndarray:
+        # note: split the values in two halves of 32 bits, so they are
+        #       represented exactly as float64 by log2
+        high = (values >> np.uint64(32)).astype(np.float64)
+        low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+
+        with np.errstate(divide="ignore"):
+            bits_high = np.floor(np.log2(high)) + 33
+            bits_low = np.floor(np.log2(low)) + 1
+
+        return np.where(
+            high > 0, bits_high, np.where(low > 0, bits_low, 0)
+        ).astype(np.int64)
+
+    def update(self, values: pd.Series):
+        if not len(values):
+            return
+
+        hashes = pd.util.hash_array(values.to_numpy())
+        shift = np.uint64(64 - self.p)
+        idx = (hashes >> shift).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - self._bit_length(rest) + 1
+
+        np.maximum.at(self.registers, idx, rank.astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = (
+            alpha * m**2 / np.sum(2.0 ** -self.registers.astype(float))
+        )
+        zeros = int(np.count_nonzero(self.registers == 0))
+
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    """
+    Keep a uniform sample of the values of a column, to estimate its
+    quantiles with a fixed amount of memory.
+
+    Each value gets a random priority and just the `size` values with the
+    lowest priorities are kept, so two sketches are merged by keeping the
+    lowest priorities of both.
+    """
+
+    def __init__(
+        self,
+        size: int = QUANTILE_SAMPLE_SIZE,
+        values: Optional[np.ndarray] = None,
+        priorities: Optional[np.ndarray] = None,
+        seed: int = 42,
+    ):
+        self.size = size
+        self.values = np.empty(0) if values is None else values
+        self.priorities = np.empty(0) if priorities is None else priorities
+        self.rng = np.random.default_rng(seed)
+
+    def _keep(self, values: np.ndarray, priorities: np.ndarray):
+        if values.size > self.size:
+            idx = np.argpartition(priorities, self.size - 1)[: self.size]
+            values, priorities = values[idx], priorities[idx]
+        self.values, self.priorities = values, priorities
+
+    def update(self, values: np.ndarray):
+        priorities = self.rng.random(values.size)
+
+        if self.values.size >= self.size:
+            # note: just the values that can replace a sampled one
+            mask = priorities < self.priorities.max()
+            values, priorities = values[mask], priorities[mask]
+
+        self._keep(
+            np.concatenate([self.values, values.astype(np.float64)]),
+            np.concatenate([self.priorities, priorities]),
+        )
+
+    def merge(self, other: "QuantileSketch"):
+        self._keep(
+            np.concatenate([self.values, other.values]),
+            np.concatenate([self.priorities, other.priorities]),
+        )
+
+    def quantiles(self, n: int = QUANTILES) -> Optional[list]:
+        if not self.values.size:
+            return None
+        return np.quantile(self.values, np.linspace(0, 1, n)).tolist()
+
+
+class FanOutSketch:
+    """
+    Count the rows of a sample of the distinct values of a column, e.g.
+    the children of each parent of a foreign key, for at most `size`
+    values.
+
+    A value is kept when its hash has `level` trailing zero bits, so each
+    value is counted in all the batches or in none of them, and the level
+    is increased while there are more than `size` values (distinct
+    sampling). The sketches of different batches can be merged.
+    """
+
+    def __init__(
+        self,
+        size: int = FAN_OUT_SAMPLE_SIZE,
+        level: int = 0,
+        counts: Optional[Dict[int, int]] = None,
+    ):
+        self.size = size
+        self.level = level
+        self.counts: Dict[int, int] = counts or {}
+
+    def _get_mask(self) -> int:
+        return (1 << self.level) - 1
+
+    def _prune(self):
+        while len(self.counts) > self.size:
+            self.level += 1
+            mask = self._get_mask()
+            self.counts = {
+                h: c for h, c in self.counts.items() if not h & mask
+            }
+
+    def update(self, values: pd.Series, counts: Optional[np.ndarray] = None):
+        """
+        Count the values, or add their `counts` when they are already
+        grouped (e.g. by the database).
+        """
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        weights = np.ones(len(hashes), np.int64) if counts is None else counts
+        grouped = pd.Series(weights).groupby(hashes).sum()
+
+        keys = grouped.index.to_numpy(np.uint64)
+        keep = (keys & np.uint64(self._get_mask())) == 0
+        while keep.sum() > self.size:
+            self.level += 1
+            keep = (keys & np.uint64(self._get_mask())) == 0
+
+        for h, c in zip(keys[keep].tolist(), grouped.to_numpy()[keep]):
+            self.counts[h] = self.counts.get(h, 0) + int(c)
+
+        self._prune()
+
+    def merge(self, other: "FanOutSketch"):
+        self.level = max(self.level, other.level)
+        mask = self._get_mask()
+        counts = {h: c for h, c in self.counts.items() if not h & mask}
+
+        for h, c in other.counts.items():
+            if not h & mask:
+                counts[h] = counts.get(h, 0) + c
+
+        self.counts = counts
+        self._prune()
+
+    def quantiles(self, n: int = QUANTILES) -> Optional[list]:
+        """
+        Return the evenly spaced quantiles of the counts.
+        """
+        if not self.counts:
+            return None
+
+        counts = np.fromiter(self.counts.values(), dtype=np.float64)
+        return np.quantile(counts, np.linspace(0, 1, n)).tolist()
+
+    def to_dict(self) -> dict:
+        return {
+            "level": self.level,
+            "hashes": base64.b64encode(
+                np.fromiter(self.counts, dtype=np.uint64).tobytes()
+            ).decode(),
+            "counts": base64.b64encode(
+                np.fromiter(self.counts.values(), dtype=np.int64).tobytes()
+            ).decode(),
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> "FanOutSketch":
+        hashes = np.frombuffer(base64.b64decode(data["hashes"]), np.uint64)
+        counts = np.frombuffer(base64.b64decode(data["counts"]), np.int64)
+        return FanOutSketch(
+            level=data["level"],
+            counts=dict(zip(hashes.tolist(), counts.tolist())),
+        )
+
+
+class ColumnProfile:
+    """
+    Accumulate the statistics of a column, one batch at a time.
+
+    Mean and variance are merged with the parallel version of Welford's
+    algorithm, the distinct values are estimated by a HyperLogLog, the
+    quantiles of the numeric columns by a `QuantileSketch` and the exact
+    value counts are kept while there are at most `MAX_CATEGORIES`
+    distinct values. With `fan_out`, the rows of a sample of the values
+    are counted by a `FanOutSketch` (for the foreign keys).
+    """
+
+    def __init__(self, physical_dtype: str, fan_out: bool = False):
+        self.physical_dtype = physical_dtype
+        self.dtype = MAPS_FROM_PANDAS_TYPES[physical_dtype]
+        self.count = 0
+        self.min: Any = None
+        self.max: Any = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        # note: False when mean and variance are unknown (e.g. a profile
+        #       from the parquet footer)
+        self.moments = True
+        self.hll: Optional[HyperLogLog] = HyperLogLog()
+        # note: exact number of distinct values, when it is known
+        self.n_distinct: Optional[int] = None
+        self.value_counts: Optional[Dict] = {} if self.dtype == "str" else None
+        self.sketch: Optional[QuantileSketch] = (
+            QuantileSketch() if self.dtype in ["int", "float"] else None
+        )
+        self.fan_out: Optional[FanOutSketch] = (
+            FanOutSketch() if fan_out else None
+        )
+
+    def _merge_moments(self, count: int, mean: float, m2: float):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+
+    def _merge_min_max(self, v_min, v_max):
+        if v_min is not None:
+            self.min = v_min if self.min is None else min(self.min, v_min)
+        if v_max is not None:
+            self.max = v_max if self.max is None else max(self.max, v_max)
+
+    def _merge_value_counts(self, value_counts: Optional[Dict]):
+        if self.value_counts is None or value_counts is None:
+            self.value_counts = None
+            return
+
+        for k, v in value_counts.items():
+            self.value_counts[k] = self.value_counts.get(k, 0) + v
+
+        if len(self.value_counts) > MAX_CATEGORIES:
+            self.value_counts = None
+
+    def update(self, values: pd.Series):
+        values = values.dropna()
+        count = values.shape[0]
+
+        if not count:
+            return
+
+        if self.hll is not None:
+            self.hll.update(values)
+
+        if self.fan_out is not None:
+            self.fan_out.update(values)
+
+        if self.dtype in ["int", "float"]:
+            arr = values.to_numpy()
+            arr_float = arr.astype(np.float64)
+            mean = float(arr_float.mean())
+            m2 = float(((arr_float - mean) ** 2).sum())
+            self._merge_min_max(arr.min().item(), arr.max().item())
+            self._merge_moments(count, mean, m2)
+            if self.sketch is not None:
+                self.sketch.update(arr_float)
+            return
+
+        self.count += count
+
+        if self.dtype in ["date", "datetime"]:
+            self._merge_min_max(values.min(), values.max())
+        elif self.dtype == "str" and self.value_counts is not None:
+            # note: once there are more than `MAX_CATEGORIES` values, the
+            #       counts are dropped, so they aren't computed anymore
+            counts = values.value_counts()
+            self._merge_value_counts(
+                counts.to_dict() if counts.shape[0] <= MAX_CATEGORIES else None
+            )
+
+    def merge(self, other: "ColumnProfile"):
+        if not other.count:
+            return
+
+        if not self.count:
+            self.n_distinct = other.n_distinct
+            self.moments = other.moments
+            self.fan_out = (
+                None
+                if other.fan_out is None
+                else FanOutSketch.from_dict(other.fan_out.to_dict())
+            )
+        else:
+            self.n_distinct = None
+            self.moments = self.moments and other.moments
+            if self.fan_out is not None and other.fan_out is not None:
+                self.fan_out.merge(other.fan_out)
+            else:
+                self.fan_out = None
+
+        if self.hll is not None and other.hll is not None:
+            self.hll.merge(other.hll)
+        else:
+            self.hll = None
+
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+        else:
+            self.sketch = None
+
+        self._merge_min_max(other.min, other.max)
+
+        if self.dtype in ["int", "float"]:
+            self._merge_moments(other.count, other.mean, other.m2)
+        else:
+            self.count += other.count
+
+        if self.dtype == "str":
+            self._merge_value_counts(other.value_counts)
+
+    @property
+    def std(self) -> Optional[float]:
+        if self.count < 2 or not self.moments:
+            return None
+        return float(np.sqrt(self.m2 / (self.count - 1)))
+
+    @property
+    def distinct(self) -> Optional[int]:
+        if self.n_distinct is not None:
+            return self.n_distinct
+        if self.value_counts is not None:
+            return len(self.value_counts)
+        if self.hll is not None:
+            return self.hll.estimate()
+        return None
+
+    @property
+    def quantiles(self) -> Optional[list]:
+        if self.sketch is None or not self.count:
+            return None
+
+        quantiles = self.sketch.quantiles()
+        if quantiles is None:
+            return None
+
+        # note: the sample doesn't always have the extreme values
+        quantiles[0], quantiles[-1] = self.min, self.max
+        return quantiles
+
+    def to_dict(self) -> dict:
+        is_datetime = self.dtype in ["date", "datetime"]
+        return {
+            "physical-dtype": self.physical_dtype,
+            "count": self.count,
+            "min": str(self.min) if is_datetime else self.min,
+            "max": str(self.max) if is_datetime else self.max,
+            "mean": self.mean,
+            "m2": self.m2,
+            "moments": self.moments,
+            "hll": None
+            if self.hll is None
+            else base64.b64encode(self.hll.registers.tobytes()).decode(),
+            "n-distinct": self.n_distinct,
+            "value-counts": self.value_counts,
+            "fan-out": None
+            if self.fan_out is None
+            else self.fan_out.to_dict(),
+            "sketch": None
+            if self.sketch is None
+            else [
+                base64.b64encode(self.sketch.values.tobytes()).decode(),
+                base64.b64encode(self.sketch.priorities.tobytes()).decode(),
+            ],
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> "ColumnProfile":
+        column = ColumnProfile(data["physical-dtype"])
+        is_datetime = column.dtype in ["date", "datetime"]
+        column.count = data["count"]
+        for k in ["min", "max"]:
+            value = data[k]
+            if is_datetime and value is not None:
+                value = pd.Timestamp(value)
+            setattr(column, k, value)
+        column.mean = data["mean"]
+        column.m2 = data["m2"]
+        column.moments = data["moments"]
+        column.hll = (
+            None
+            if data["hll"] is None
+            else HyperLogLog(
+                registers=np.frombuffer(
+                    base64.b64decode(data["hll"]), dtype=np.uint8
+                ).copy()
+            )
+        )
+        column.n_distinct = data["n-distinct"]
+        column.value_counts = data["value-counts"]
+        column.fan_out = (
+            None
+            if data.get("fan-out") is None
+            else FanOutSketch.from_dict(data["fan-out"])
+        )
+        column.sketch = (
+            None
+            if data.get("sketch") is None
+            else QuantileSketch(
+                values=np.frombuffer(
+                    base64.b64decode(data["sketch"][0]), dtype=np.float64
+                ).copy(),
+                priorities=np.frombuffer(
+                    base64.b64decode(data["sketch"][1]), dtype=np.float64
+                ).copy(),
+            )
+        )
+        return column
+
+
+class TableProfile:
+    """
+    Accumulate the statistics of all the columns of a table, reading the
+    data just once, one batch at a time.
+
+    When the batches are a sample of the table, `sample` is the fraction
+    of the rows used, so the counts can be scaled to the whole table.
+    The fan-out is profiled for the `key_columns` and the columns with the
+    `_id` suffix (the foreign keys).
+    """
+
+    def __init__(
+        self,
+        sample: Optional[float] = None,
+        key_columns: Optional[Iterable[str]] = None,
+    ):
+        self.sample = sample
+        self.rows = 0
+        self.columns: Dict[str, ColumnProfile] = {}
+        self.key_columns: Set[str] = set(key_columns or [])
+
+    def is_key_column(self, name: str) -> bool:
+        return name in self.key_columns or name.lower().endswith("_id")
+
+    def update(self, df: pd.DataFrame) -> "TableProfile":
+        self.rows += df.shape[0]
+
+        for k in df.columns:
+            if k not in self.columns:
+                self.columns[k] = ColumnProfile(
+                    str(df[k].dtype), fan_out=self.is_key_column(k)
+                )
+            self.columns[k].update(df[k])
+
+        return self
+
+    def merge(self, other: "TableProfile") -> "TableProfile":
+        self.rows += other.rows
+
+        for k, column in other.columns.items():
+            if k not in self.columns:
+                self.columns[k] = ColumnProfile(column.physical_dtype)
+            self.columns[k].merge(column)
+
+        return self
+
+    @staticmethod
+    def from_batches(
+        batches: Iterable[pd.DataFrame],
+        sample: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        seed: int = 42,
+        key_columns: Optional[Iterable[str]] = None,
+    ) -> "TableProfile":
+        """
+        Profile a table from a stream of batches.
+
+        `sample` keeps each row with the given probability and `max_rows`
+        stops reading after the given number of rows, so just one batch is
+        kept in memory at a time.
+        """
+        profile = TableProfile(sample=sample, key_columns=key_columns)
+        rng = np.random.default_rng(seed)
+        read = 0
+
+        for df in batches:
+            if max_rows is not None:
+                df = df.iloc[: max_rows - read]
+            read += df.shape[0]
+
+            if sample is not None:
+                df = df[rng.random(df.shape[0]) < sample]
+
+            profile.update(df)
+
+            if max_rows is not None and read >= max_rows:
+                break
+
+        return profile
+
+    def to_dict(self) -> dict:
+        return {
+            "sample": self.sample,
+            "rows": self.rows,
+            "columns": {k: v.to_dict() for k, v in self.columns.items()},
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> "TableProfile":
+        profile = TableProfile(sample=data["sample"])
+        profile.rows = data["rows"]
+        profile.columns = {
+            k: ColumnProfile.from_dict(v) for k, v in data["columns"].items()
+        }
+        return profile
+
+    @staticmethod
+    def from_parquet_metadata(parquet_file: pq.ParquetFile) -> "TableProfile":
+        """
+        Profile a parquet file just using the row group statistics from
+        its footer, without reading the data.
+
+        Just count, min and max are known, mean, standard deviation and
+        distinct values are not.
+        """
+        metadata = parquet_file.metadata
+        profile = TableProfile()
+        profile.rows = metadata.num_rows
+
+        for i, field in enumerate(parquet_file.schema_arrow):
+            pandas_dtype = field.type.to_pandas_dtype()
+            if not isinstance(pandas_dtype, pd.api.extensions.ExtensionDtype):
+                pandas_dtype = np.dtype(pandas_dtype)
+
+            column = ColumnProfile(str(pandas_dtype))
+            column.moments = False
+            column.hll = None
+            column.sketch = None
+            column.value_counts = None
+
+            for i_rg in range(metadata.num_row_groups):
+                col_metadata = metadata.row_group(i_rg).column(i)
+                stats = col_metadata.statistics
+
+                if stats is None:
+                    continue
+
+                column.count += col_metadata.num_values - stats.null_count
+
+                if not stats.has_min_max:
+                    continue
+
+                v_min, v_max = stats.min, stats.max
+                if column.dtype in ["date", "datetime"]:
+                    v_min, v_max = pd.Timestamp(v_min), pd.Timestamp(v_max)
+                column._merge_min_max(v_min, v_max)
+
+            profile.columns[field.name] = column
+
+        return profile
+
+    def get_count(self, column: ColumnProfile) -> int:
+        if not self.sample:
+            return column.count
+        return int(round(column.count / self.sample))
+
+    @staticmethod
+    def _get_physical_dtype(sql_type) -> str:
+        for klass, physical_dtype in MAPS_FROM_SQL_TYPES:
+            if isinstance(sql_type, klass):
+                return physical_dtype
+        return "object"
+
+    @staticmethod
+    def from_sql(
+        conn: sqla.engine.Connection,
+        table: Union[str, sqla.Table],
+        key_columns: Optional[Iterable[str]] = None,
+        batch_size: int = 100_000,
+    ) -> "TableProfile":
+        """
+        Profile a table pushing the aggregations down to the database.
+
+        The column types come from the table reflection, and all the
+        statistics are computed by one `SELECT` statement. The value
+        counts of the string columns with at most `MAX_CATEGORIES`
+        distinct values are computed by a bounded `GROUP BY`, and the
+        rows of each value of the key columns (for the fan-out) by a
+        `GROUP BY` read in batches of `batch_size` values. `table` can be
+        the table name or an already reflected table.
+        """
+        if isinstance(table, str):
+            table = sqla.Table(table, sqla.MetaData(), autoload_with=conn)
+        # note: sqlite doesn't have a standard deviation function
+        has_stddev = conn.dialect.name != "sqlite"
+
+        profile = TableProfile(key_columns=key_columns)
+        aggs = [sqla.func.count().label("__rows__")]
+
+        for i, col in enumerate(table.columns):
+            column = ColumnProfile(
+                TableProfile._get_physical_dtype(col.type),
+                fan_out=profile.is_key_column(col.name),
+            )
+            profile.columns[col.name] = column
+
+            aggs.append(sqla.func.count(col).label(f"count_{i}"))
+            aggs.append(
+                sqla.func.count(sqla.distinct(col)).label(f"distinct_{i}")
+            )
+
+            if column.dtype in ["int", "float", "datetime"]:
+                aggs.append(sqla.func.min(col).label(f"min_{i}"))
+                aggs.append(sqla.func.max(col).label(f"max_{i}"))
+
+            if column.dtype in ["int", "float"]:
+                col_float = sqla.cast(col, sqla.Float)
+                aggs.append(sqla.func.avg(col_float).label(f"mean_{i}"))
+                if has_stddev:
+                    aggs.append(
+                        sqla.func.stddev_samp(col_float).label(f"std_{i}")
+                    )
+                else:
+                    aggs.append(
+                        sqla.func.avg(col_float * col_float).label(
+                            f"mean_sq_{i}"
+                        )
+                    )
+
+        result = conn.execute(sqla.select(*aggs).select_from(table))
+        stats = result.mappings().one()
+
+        profile.rows = stats["__rows__"]
+
+        for i, col in enumerate(table.columns):
+            column = profile.columns[col.name]
+            column.count = stats[f"count_{i}"]
+            column.n_distinct = stats[f"distinct_{i}"]
+            column.hll = None
+            column.sketch = None
+
+            if not column.count:
+                continue
+
+            if column.dtype == "datetime":
+                column.min = pd.Timestamp(stats[f"min_{i}"])
+                column.max = pd.Timestamp(stats[f"max_{i}"])
+
+            if column.dtype in ["int", "float"]:
+                f = int if column.dtype == "int" else float
+                column.min = f(stats[f"min_{i}"])
+                column.max = f(stats[f"max_{i}"])
+                column.mean = float(stats[f"mean_{i}"])
+
+                if has_stddev:
+                    std = float(stats[f"std_{i}"] or 0)
+                    column.m2 = std**2 * (column.count - 1)
+                else:
+                    mean_sq = float(stats[f"mean_sq_{i}"])
+                    variance = max(mean_sq - column.mean**2, 0)
+                    column.m2 = variance * column.count
+
+            if column.dtype == "str" and column.n_distinct <= MAX_CATEGORIES:
+                query = (
+                    sqla.select(col, sqla.func.count().label("n"))
+                    .where(col.is_not(None))
+                    .group_by(col)
+                    .order_by(sqla.desc("n"))
+                    .limit(MAX_CATEGORIES)
+                )
+                column.value_counts = {
+                    k: v for k, v in conn.execute(query).all()
+                }
+
+            if column.fan_out is not None:
+                query = (
+                    sqla.select(col, sqla.func.count().label("n"))
+                    .where(col.is_not(None))
+                    .group_by(col)
+                )
+                # note: stream just this query, not the caller connection
+                result = conn.execute(
+                    query, execution_options={"stream_results": True}
+                )
+                for rows in result.partitions(batch_size):
+                    values, counts = zip(*rows)
+                    column.fan_out.update(
+                        pd.Series(values), np.asarray(counts, np.int64)
+                    )
+
+        return profile
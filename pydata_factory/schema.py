@@ -3,12 +3,19 @@ Create datasets with fake data for testing.
 """
 import json
 import os
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import sqlalchemy as sqla
 
-from pydata_factory.config import MAPS_FROM_PANDAS_TYPES, MAPS_TO_PANDAS_TYPES
+from pydata_factory.cache import ProfileCache, normalize_fingerprint
+from pydata_factory.config import BUNDLE_FILENAME, MAPS_TO_PANDAS_TYPES
+from pydata_factory.profiler import TableProfile
+from pydata_factory.text import GenText
 from pydata_factory.utils import (
     get_attr_name,
     get_class_name,
@@ -22,7 +29,9 @@ def cast_or_null(value, func):
 
 class Schema:
     @staticmethod
-    def get_schema(df, physical_name: str, namespace: str = ""):
+    def get_schema_from_profile(
+        profile: TableProfile, physical_name: str, namespace: str = ""
+    ) -> dict:
         name = get_class_name(physical_name, namespace)
         schema = {
             "name": name,
@@ -32,12 +41,12 @@ class Schema:
         schema["attributes"] = {}
 
         attrs = schema["attributes"]
-        for k in df.columns:
+        for k, col in profile.columns.items():
             k_new = get_attr_name(k)
             attrs[k_new] = {"physical-name": k}
 
-            attrs[k_new]["physical-dtype"] = str(df[k].dtype)
-            dtype = MAPS_FROM_PANDAS_TYPES[attrs[k_new]["physical-dtype"]]
+            attrs[k_new]["physical-dtype"] = col.physical_dtype
+            dtype = col.dtype
             attrs[k_new]["dtype"] = dtype
 
             if k_new.endswith("_id"):
@@ -47,25 +56,62 @@ class Schema:
 
             if dtype in ['int', 'float']:
                 f = int if dtype.startswith("int") else float
-                attrs[k_new]["min"] = cast_or_null(df[k].min(), f)
-                attrs[k_new]["max"] = cast_or_null(df[k].max(), f)
-                attrs[k_new]["mean"] = cast_or_null(df[k].mean(), f)
-                attrs[k_new]["std"] = cast_or_null(df[k].std(), f)
-                attrs[k_new]["count"] = cast_or_null(df[k].count(), int)
+                attrs[k_new]["min"] = cast_or_null(col.min, f)
+                attrs[k_new]["max"] = cast_or_null(col.max, f)
+                # note: the distribution is kept as floats for the int
+                #       columns too, the samplers round the values
+                attrs[k_new]["mean"] = cast_or_null(
+                    col.mean if col.count and col.moments else None, float
+                )
+                attrs[k_new]["std"] = cast_or_null(col.std, float)
+                quantiles = col.quantiles
+                if quantiles is not None:
+                    attrs[k_new]["quantiles"] = [
+                        cast_or_null(v, float) for v in quantiles
+                    ]
+                attrs[k_new]["count"] = profile.get_count(col)
             elif dtype in ["date", "datetime"]:
-                attrs[k_new]["min"] = normalize_datetime(df[k].min())
-                attrs[k_new]["max"] = normalize_datetime(df[k].max())
+                attrs[k_new]["min"] = normalize_datetime(col.min)
+                attrs[k_new]["max"] = normalize_datetime(col.max)
             elif dtype == "str":
-                uniques = df[k].unique()
-                threshold = df.shape[0] / 5
-                if 0 > len(uniques) <= threshold:
-                    attrs[k_new]["categories"] = uniques.tolist()
+                n_uniques = col.distinct
+                threshold = profile.rows / 5
+                if (
+                    col.value_counts
+                    and n_uniques is not None
+                    and 0 < n_uniques <= threshold
+                ):
+                    value_counts = sorted(
+                        col.value_counts.items(), key=lambda kv: -kv[1]
+                    )
+                    total = sum(v for _, v in value_counts)
+                    attrs[k_new]["categories"] = [k for k, _ in value_counts]
+                    attrs[k_new]["frequencies"] = [
+                        v / total for _, v in value_counts
+                    ]
+
+            attrs[k_new]["distinct"] = col.distinct
+
+            # note: the rows of each parent, scaled when the profile is a
+            #       sample of the table
+            fan_out = col.fan_out.quantiles() if col.fan_out else None
+            if fan_out is not None:
+                attrs[k_new]["fan-out"] = [
+                    v / (profile.sample or 1) for v in fan_out
+                ]
 
             for k, v in list(attrs[k_new].items()):
-                if pd.isnull(v):
+                if not isinstance(v, list) and pd.isnull(v):
                     attrs[k_new][k] = None
         return schema
 
+    @staticmethod
+    def get_schema(df, physical_name: str, namespace: str = ""):
+        profile = TableProfile().update(df)
+        return Schema.get_schema_from_profile(
+            profile, physical_name, namespace
+        )
+
     @staticmethod
     def load_file(path: str, config_extra_file: Optional[str] = None):
 
@@ -80,46 +126,417 @@ class Schema:
             content = f.read()
             schema = json.loads(content)
 
+        return Schema._apply_config_extra(schema, config_extra)
+
+    @staticmethod
+    def _apply_config_extra(schema: dict, config_extra: dict) -> dict:
         schema_name = schema["name"]
 
         if config_extra and schema_name in config_extra:
-            for k_attr, v_attr in config_extra[schema_name][
-                "attributes"
-            ].items():
+            for k_attr, v_attr in (
+                config_extra[schema_name].get("attributes", {}).items()
+            ):
                 schema["attributes"][k_attr].update(v_attr)
 
+            # note: the unique keys can be declared for the whole schema
+            for k in ["primary-key", "unique"]:
+                if k in config_extra[schema_name]:
+                    schema[k] = config_extra[schema_name][k]
+
         return schema
 
     @staticmethod
-    def to_dataframe(schema):
-        df = pd.DataFrame({}, columns=schema["attributes"].keys())
-        dtypes = {
-            k: MAPS_TO_PANDAS_TYPES[schema["attributes"][k]["dtype"]]
-            for k in df.keys()
+    def load_bundle(path: str, config_extra_file: Optional[str] = None):
+        """
+        Load all the schemas from a schema bundle file (see
+        `Schema.from_database`).
+        """
+        config_extra = {}
+
+        if config_extra_file:
+            with open(config_extra_file, "r") as f:
+                content = f.read()
+                config_extra = json.loads(content)
+
+        with open(path, "r") as f:
+            content = f.read()
+            bundle = json.loads(content)
+
+        return {
+            k_schema: Schema._apply_config_extra(schema, config_extra)
+            for k_schema, schema in bundle.items()
+            if k_schema != "__config__"
+        }
+
+    @staticmethod
+    def write_bundle(schemas: dict, target_file: str):
+        """
+        Write all the schemas in one file, with their topological order
+        in `__config__.priorities` (see `Schema.get_priorities`).
+        """
+        bundle = {
+            "__config__": {"priorities": Schema.sort_topologically(schemas)}
+        }
+        bundle.update(schemas)
+
+        with open(target_file, "w") as f:
+            json.dump(bundle, fp=f, indent=2)
+
+    @staticmethod
+    def to_dataframe(schema, dtypes: Optional[dict] = None):
+        """
+        Create an empty DataFrame with the attributes of the schema, using
+        the given `dtypes` or the default dtype of each attribute.
+        """
+        dtypes = Schema.get_column_dtypes(schema, dtypes)
+        return pd.DataFrame({k: pd.Series(dtype=v) for k, v in dtypes.items()})
+
+    @staticmethod
+    def get_column_dtypes(schema, dtypes: Optional[dict] = None) -> dict:
+        """
+        Return the dtype of each attribute of the schema, in order: the
+        given `dtypes` or the default dtype of the attribute.
+        """
+        return {
+            k: (dtypes or {}).get(
+                k, MAPS_TO_PANDAS_TYPES.get(v["dtype"], "object")
+            )
+            for k, v in schema["attributes"].items()
+        }
+
+    @staticmethod
+    def _get_int_dtype(attr: dict) -> str:
+        v_min = attr.get("min")
+        v_max = attr.get("max")
+        v_min = 0 if v_min is None else v_min
+        v_max = 9999 if v_max is None else v_max
+
+        for dtype in ["int8", "int16", "int32"]:
+            info = np.iinfo(dtype)
+            if info.min <= v_min and v_max <= info.max:
+                return dtype
+        return "int64"
+
+    @staticmethod
+    def get_dtypes(schema: dict, compact: bool = False) -> dict:
+        """
+        Return the pandas dtype of the generated attributes.
+
+        The `categories` attributes are categorical, the other ones use
+        their `physical-dtype` (datetimes are in UTC by default). With
+        `compact`, the integers use the narrowest type for their `min` and
+        `max` (except the keys, that keep their type) and the strings are
+        stored by pyarrow.
+        """
+        dtypes: dict = {}
+
+        for k_attr, v_attr in schema["attributes"].items():
+            dtype = v_attr["dtype"]
+            is_generated = not v_attr.get("__factory__")
+            is_key = k_attr == "id" or v_attr.get("depends-on")
+
+            # note: the patterns take precedence over the categories
+            is_pattern = GenText.get_pattern(schema, k_attr) is not None
+
+            if is_generated and v_attr.get("categories") and not is_pattern:
+                dtypes[k_attr] = pd.CategoricalDtype(v_attr["categories"])
+            elif compact and is_generated and dtype == "int" and not is_key:
+                dtypes[k_attr] = Schema._get_int_dtype(v_attr)
+            elif compact and is_generated and dtype == "str":
+                dtypes[k_attr] = "string[pyarrow]"
+            elif v_attr.get("physical-dtype"):
+                dtypes[k_attr] = v_attr["physical-dtype"]
+            elif dtype == "datetime":
+                dtypes[k_attr] = "datetime64[ns, UTC]"
+
+        return dtypes
+
+    @staticmethod
+    def _read_parquet_profile(
+        path: str,
+        sample: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        batch_size: int = 100_000,
+        footer_only: bool = False,
+    ) -> TableProfile:
+        parquet_file = pq.ParquetFile(path)
+
+        if footer_only:
+            return TableProfile.from_parquet_metadata(parquet_file)
+
+        batches = (
+            batch.to_pandas()
+            for batch in parquet_file.iter_batches(batch_size=batch_size)
+        )
+        return TableProfile.from_batches(
+            batches, sample=sample, max_rows=max_rows
+        )
+
+    @staticmethod
+    def _profile_parquet(
+        origin: str,
+        sample: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        batch_size: int = 100_000,
+        footer_only: bool = False,
+        cache: Optional[ProfileCache] = None,
+    ) -> TableProfile:
+        """
+        Profile a parquet file, or a directory with the parquet files of
+        the partitions of a table.
+
+        With `cache`, each file is profiled just if its fingerprint
+        changed, and the profiles of all the files are merged.
+        """
+        paths = (
+            sorted(str(p) for p in Path(origin).rglob("*.parquet"))
+            if os.path.isdir(origin)
+            else [origin]
+        )
+        options = {
+            "sample": sample,
+            "max-rows": max_rows,
+            "footer-only": footer_only,
         }
-        return df.astype(dtypes)
+
+        profile = TableProfile(sample=sample)
+
+        for path in paths:
+            remaining = None if max_rows is None else max_rows - profile.rows
+            if remaining is not None and remaining <= 0:
+                break
+
+            if cache is None:
+                part = Schema._read_parquet_profile(
+                    path, sample, remaining, batch_size, footer_only
+                )
+                profile.merge(part)
+                continue
+
+            key = os.path.abspath(path)
+            fingerprint = ProfileCache.get_parquet_fingerprint(path)
+            fingerprint.update(options)
+
+            cached = cache.get(key, fingerprint)
+            if cached is None:
+                cached = Schema._read_parquet_profile(
+                    path, sample, remaining, batch_size, footer_only
+                )
+                cache.set(key, fingerprint, cached)
+
+            profile.merge(cached)
+
+        return profile
+
+    @staticmethod
+    def _get_fk_columns(table: sqla.Table) -> List[str]:
+        return [fk.parent.name for fk in table.foreign_keys]
+
+    @staticmethod
+    def _read_sql_profile(
+        conn: sqla.engine.Connection,
+        table: sqla.Table,
+        sample: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        batch_size: int = 100_000,
+        pushdown: bool = False,
+    ) -> TableProfile:
+        key_columns = Schema._get_fk_columns(table)
+
+        if pushdown:
+            return TableProfile.from_sql(conn, table, key_columns, batch_size)
+
+        query = table.select()
+        if max_rows is not None:
+            query = query.limit(max_rows)
+
+        batches = pd.read_sql(query, con=conn, chunksize=batch_size)
+        return TableProfile.from_batches(
+            batches,
+            sample=sample,
+            max_rows=max_rows,
+            key_columns=key_columns,
+        )
+
+    @staticmethod
+    def _read_sql_delta_profile(
+        conn: sqla.engine.Connection,
+        table: sqla.Table,
+        entry: dict,
+        fingerprint: dict,
+        key_column: Optional[str],
+        updated_column: Optional[str],
+        batch_size: int = 100_000,
+    ) -> Optional[TableProfile]:
+        """
+        Merge the rows added after the cached profile into it.
+
+        It works just for tables where new rows have greater keys and
+        existing rows were not updated or deleted, otherwise it returns
+        None and the table should be profiled again.
+        """
+        old = entry["fingerprint"]
+
+        if (
+            key_column is None
+            or old.get("max-key") is None
+            or fingerprint.get("max-key") is None
+            or fingerprint["count"] <= old["count"]
+        ):
+            return None
+
+        def parse(column: sqla.Column, value):
+            if isinstance(column.type, (sqla.DateTime, sqla.Date)):
+                return pd.Timestamp(value).to_pydatetime()
+            return value
+
+        key = table.columns[key_column]
+        max_key = parse(key, old["max-key"])
+
+        if updated_column and old.get("max-updated") is not None:
+            updated = table.columns[updated_column]
+            query = (
+                sqla.select(sqla.func.count())
+                .select_from(table)
+                .where(key <= max_key)
+                .where(updated > parse(updated, old["max-updated"]))
+            )
+            if conn.execute(query).scalar():
+                return None
+
+        batches = pd.read_sql(
+            table.select().where(key > max_key),
+            con=conn,
+            chunksize=batch_size,
+        )
+        delta = TableProfile.from_batches(
+            batches, key_columns=Schema._get_fk_columns(table)
+        )
+
+        if old["count"] + delta.rows != fingerprint["count"]:
+            return None
+
+        return entry["profile"].merge(delta)
+
+    @staticmethod
+    def _profile_sql(
+        engine: sqla.engine.base.Engine,
+        table: Union[str, sqla.Table],
+        sample: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        batch_size: int = 100_000,
+        pushdown: bool = False,
+        cache: Optional[ProfileCache] = None,
+        key_column: Optional[str] = "id",
+        updated_column: Optional[str] = "updated_at",
+    ) -> TableProfile:
+        """
+        Profile a table.
+
+        With `cache`, the table is not read when its fingerprint didn't
+        change, and when rows were just appended (by `key_column`), just
+        the new rows are profiled and merged into the cached profile.
+        """
+        with engine.connect() as conn:
+            if isinstance(table, str):
+                table = sqla.Table(table, sqla.MetaData(), autoload_with=conn)
+
+            if cache is None:
+                return Schema._read_sql_profile(
+                    conn, table, sample, max_rows, batch_size, pushdown
+                )
+
+            key = (
+                f"{engine.url.render_as_string(hide_password=True)}"
+                f"#{table.name}"
+            )
+            fingerprint = ProfileCache.get_sql_fingerprint(
+                conn, table, key_column, updated_column
+            )
+            fingerprint.update(
+                {"sample": sample, "max-rows": max_rows, "pushdown": pushdown}
+            )
+            fingerprint = normalize_fingerprint(fingerprint)
+
+            entry = cache.get_entry(key)
+            profile = None
+
+            if entry is not None and entry["fingerprint"] == fingerprint:
+                return entry["profile"]
+
+            if entry is not None and not (pushdown or sample or max_rows):
+                profile = Schema._read_sql_delta_profile(
+                    conn,
+                    table,
+                    entry,
+                    fingerprint,
+                    key_column,
+                    updated_column,
+                    batch_size,
+                )
+
+            if profile is None:
+                profile = Schema._read_sql_profile(
+                    conn, table, sample, max_rows, batch_size, pushdown
+                )
+
+            cache.set(key, fingerprint, profile)
+
+        return profile
 
     @staticmethod
     def from_parquet(
-        origin: str, target_dir: str, namespace: str = ""
+        origin: str,
+        target_dir: str,
+        namespace: str = "",
+        sample: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        batch_size: int = 100_000,
+        footer_only: bool = False,
+        cache: bool = False,
     ) -> dict:
         """
         Create a empty file just with the dataset schema.
+
+        The file is read in batches of `batch_size` rows and profiled in
+        one pass. `sample` is the fraction of rows used and `max_rows` the
+        max number of rows read. `origin` can also be a directory with
+        the parquet files of the partitions of the dataset.
+
+        With `footer_only`, just the row group statistics from the footer
+        are used (count, min and max), so the data is not read. With
+        `cache`, the profiles are stored in `__cache__.json`, in the target
+        directory, by the fingerprint of each file, and just the new or
+        changed files are profiled.
         """
         os.makedirs(target_dir, exist_ok=True)
 
-        filename = origin.split(os.sep)[-1].split('.')[0]
+        filename = origin.rstrip(os.sep).split(os.sep)[-1].split('.')[0]
 
         target_file = f"{target_dir}/{filename}.json"
 
         physical_name = filename
 
-        df = pd.read_parquet(origin)
-        schema = Schema.get_schema(df, physical_name, namespace)
+        profile_cache = ProfileCache.load(target_dir) if cache else None
+
+        profile = Schema._profile_parquet(
+            origin,
+            sample=sample,
+            max_rows=max_rows,
+            batch_size=batch_size,
+            footer_only=footer_only,
+            cache=profile_cache,
+        )
+        schema = Schema.get_schema_from_profile(
+            profile, physical_name, namespace
+        )
 
         with open(target_file, "w") as f:
             json.dump(schema, fp=f, indent=2)
 
+        if profile_cache is not None:
+            profile_cache.save()
+
         return schema
 
     @staticmethod
@@ -128,9 +545,28 @@ class Schema:
         table_name: str,
         target_dir: str,
         namespace: str = "",
+        sample: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        batch_size: int = 100_000,
+        pushdown: bool = False,
+        cache: bool = False,
     ) -> dict:
         """
         Create a empty file just with the dataset schema.
+
+        The table is read in batches of `batch_size` rows and profiled in
+        one pass. `sample` is the fraction of rows used and `max_rows` the
+        max number of rows read.
+
+        With `pushdown`, the statistics are computed by the database and
+        the column types come from the table reflection, so the rows are
+        not transferred at all (`sample` and `max_rows` are not used).
+
+        With `cache`, the profile is stored in `__cache__.json`, in the
+        target directory, by a fingerprint of the table (number of rows
+        and max `id` and `updated_at`). The table is not read again when
+        it didn't change, and just the new rows are read when rows were
+        appended.
         """
         os.makedirs(target_dir, exist_ok=True)
 
@@ -138,14 +574,199 @@ class Schema:
 
         physical_name = table_name
 
-        df = pd.read_sql(f"SELECT * FROM {table_name}", con=engine)
-        schema = Schema.get_schema(df, physical_name, namespace)
+        profile_cache = ProfileCache.load(target_dir) if cache else None
+
+        profile = Schema._profile_sql(
+            engine,
+            table_name,
+            sample=sample,
+            max_rows=max_rows,
+            batch_size=batch_size,
+            pushdown=pushdown,
+            cache=profile_cache,
+        )
+        schema = Schema.get_schema_from_profile(
+            profile, physical_name, namespace
+        )
 
         with open(target_file, "w") as f:
             json.dump(schema, fp=f, indent=2)
 
+        if profile_cache is not None:
+            profile_cache.save()
+
         return schema
 
+    @staticmethod
+    def from_parquet_dir(
+        origin_dir: str,
+        target_dir: str,
+        namespace: str = "",
+        workers: int = 4,
+        sample: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        batch_size: int = 100_000,
+        footer_only: bool = False,
+        cache: bool = False,
+    ) -> dict:
+        """
+        Create the schemas for all the parquet files in a directory.
+
+        Each parquet file, or each subdirectory with partition files, is
+        a dataset. They are profiled concurrently by `workers` threads, and
+        all the schemas are written to one bundle file
+        (`__schemas__.json`). See `Schema.from_parquet` for the other
+        options.
+        """
+        os.makedirs(target_dir, exist_ok=True)
+
+        origins = sorted(
+            str(path)
+            for path in Path(origin_dir).iterdir()
+            if path.suffix == ".parquet" or path.is_dir()
+        )
+
+        profile_cache = ProfileCache.load(target_dir) if cache else None
+
+        with ThreadPoolExecutor(workers) as executor:
+            profiles = executor.map(
+                lambda origin: Schema._profile_parquet(
+                    origin,
+                    sample=sample,
+                    max_rows=max_rows,
+                    batch_size=batch_size,
+                    footer_only=footer_only,
+                    cache=profile_cache,
+                ),
+                origins,
+            )
+
+            schemas = {}
+            for origin, profile in zip(origins, profiles):
+                if not profile.columns:
+                    # note: directory without parquet files
+                    continue
+                physical_name = Path(origin).name.split(".")[0]
+                schema = Schema.get_schema_from_profile(
+                    profile, physical_name, namespace
+                )
+                schemas[schema["name"]] = schema
+
+        Schema.write_bundle(schemas, f"{target_dir}/{BUNDLE_FILENAME}")
+
+        if profile_cache is not None:
+            profile_cache.save()
+
+        return schemas
+
+    @staticmethod
+    def from_database(
+        engine: sqla.engine.base.Engine,
+        target_dir: str,
+        tables: Optional[list] = None,
+        namespace: str = "",
+        workers: int = 4,
+        sample: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        batch_size: int = 100_000,
+        pushdown: bool = False,
+        cache: bool = False,
+    ) -> dict:
+        """
+        Create the schemas for all the tables of a database, or just for
+        the given `tables`.
+
+        The tables are reflected once and profiled concurrently by
+        `workers` threads, each one using a connection from the engine
+        pool. The `depends-on` attributes come from the foreign-key
+        constraints, instead of the `_id` suffix. All the schemas are
+        written to one bundle file (`__schemas__.json`). See
+        `Schema.from_sql` for the other options.
+        """
+        os.makedirs(target_dir, exist_ok=True)
+
+        metadata = sqla.MetaData()
+        metadata.reflect(bind=engine, only=tables)
+
+        table_names = tables or [t.name for t in metadata.sorted_tables]
+
+        profile_cache = ProfileCache.load(target_dir) if cache else None
+
+        with ThreadPoolExecutor(workers) as executor:
+            profiles = executor.map(
+                lambda table_name: Schema._profile_sql(
+                    engine,
+                    metadata.tables[table_name],
+                    sample=sample,
+                    max_rows=max_rows,
+                    batch_size=batch_size,
+                    pushdown=pushdown,
+                    cache=profile_cache,
+                ),
+                table_names,
+            )
+
+            schemas = {}
+            for table_name, profile in zip(table_names, profiles):
+                schema = Schema.get_schema_from_profile(
+                    profile, table_name, namespace
+                )
+                Schema._set_foreign_keys(
+                    schema, metadata.tables[table_name], namespace
+                )
+                Schema._set_unique_keys(schema, metadata.tables[table_name])
+                schemas[schema["name"]] = schema
+
+        Schema.write_bundle(schemas, f"{target_dir}/{BUNDLE_FILENAME}")
+
+        if profile_cache is not None:
+            profile_cache.save()
+
+        return schemas
+
+    @staticmethod
+    def _set_foreign_keys(schema: dict, table: sqla.Table, namespace: str):
+        """
+        Replace the `depends-on` attributes by the table's foreign keys.
+        """
+        map_attr = {
+            v_attr.get("physical-name", k_attr): k_attr
+            for k_attr, v_attr in schema["attributes"].items()
+        }
+
+        for v_attr in schema["attributes"].values():
+            v_attr.pop("depends-on", None)
+
+        for fk in table.foreign_keys:
+            dep_name = get_class_name(fk.column.table.name, namespace)
+            dep_attr = get_attr_name(fk.column.name)
+            schema["attributes"][map_attr[fk.parent.name]][
+                "depends-on"
+            ] = f"{dep_name}.{dep_attr}"
+
+    @staticmethod
+    def _set_unique_keys(schema: dict, table: sqla.Table):
+        """
+        Set the `primary-key` and the `unique` keys of the schema from the
+        table's constraints.
+        """
+        map_attr = {
+            v_attr.get("physical-name", k_attr): k_attr
+            for k_attr, v_attr in schema["attributes"].items()
+        }
+
+        primary_key = [map_attr[c.name] for c in table.primary_key.columns]
+        if primary_key:
+            schema["primary-key"] = primary_key
+
+        unique = [
+            [map_attr[c.name] for c in constraint.columns]
+            for constraint in table.constraints
+            if isinstance(constraint, sqla.UniqueConstraint)
+        ]
+        if unique:
+            schema["unique"] = unique
+
     @staticmethod
     def get_map_physical_attributes(schema: dict) -> dict:
         map_attr = {}
@@ -163,9 +784,103 @@ class Schema:
         )
 
     @staticmethod
-    def get_priorities(config_file: str) -> list:
+    def get_priorities(
+        config_file: str, schemas: Optional[dict] = None
+    ) -> list:
         with open(config_file, "r") as f:
             content = f.read()
             config = json.loads(content)
 
-        return config.get("__config__", {}).get("priorities", [])
+        priorities = config.get("__config__", {}).get("priorities", [])
+
+        if schemas is None:
+            return priorities
+
+        # note: the hand-written priorities are just used to break the ties
+        #       of the topological order
+        return Schema.sort_topologically(schemas, priorities or None)
+
+    @staticmethod
+    def get_dependencies(schemas: dict) -> Dict[str, set]:
+        """
+        Return the keys of the schemas that each schema depends on, using
+        the `depends-on` attributes (e.g. `Project.client_id`).
+
+        Dependencies on schemas that are not given, and on the schema
+        itself, are ignored.
+        """
+        names = {schema["name"]: k for k, schema in schemas.items()}
+        dependencies: Dict[str, set] = {}
+
+        for k_schema, schema in schemas.items():
+            dependencies[k_schema] = set()
+
+            for k_attr, v_attr in schema["attributes"].items():
+                if not v_attr.get("depends-on"):
+                    continue
+
+                dep_name = v_attr.get("depends-on").split(".")[0]
+                dep_schema = names.get(dep_name)
+
+                if dep_schema is not None and dep_schema != k_schema:
+                    dependencies[k_schema].add(dep_schema)
+
+        return dependencies
+
+    @staticmethod
+    def get_levels(
+        schemas: dict, priorities: Optional[list] = None
+    ) -> List[list]:
+        """
+        Group the schemas in levels, where each schema just depends on
+        schemas from the previous levels, so the schemas in the same level
+        are independent of each other.
+
+        Just the schemas in `priorities` are used, if it is given, and its
+        order is kept inside each level.
+        """
+        if priorities is None:
+            priorities = list(schemas.keys())
+
+        missing = [k for k in priorities if k not in schemas]
+        if missing:
+            raise ValueError(
+                f"The priorities have unknown schemas: {', '.join(missing)}."
+            )
+
+        dependencies = Schema.get_dependencies(
+            {k: schemas[k] for k in priorities}
+        )
+
+        levels: List[list] = []
+        done: set = set()
+        pending = list(priorities)
+
+        while pending:
+            level = [k for k in pending if dependencies[k] <= done]
+
+            if not level:
+                raise ValueError(
+                    "Cyclic dependency between the schemas: "
+                    f"{', '.join(pending)}."
+                )
+
+            levels.append(level)
+            done.update(level)
+            pending = [k for k in pending if k not in done]
+
+        return levels
+
+    @staticmethod
+    def sort_topologically(
+        schemas: dict, priorities: Optional[list] = None
+    ) -> list:
+        """
+        Return the keys of the schemas sorted so that each schema comes
+        after the schemas it depends on.
+        """
+        return [
+            k_schema
+            for level in Schema.get_levels(schemas, priorities)
+            for k_schema in level
+        ]
@@ -0,0 +1,126 @@
+"""
+Module for the deterministic seeding of the generated data.
+"""
+import zlib
+from typing import Callable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pydata_factory.config import SEED_BLOCK_SIZE
+
+
+class GenSeed:
+    """
+    Derive independent random streams from one seed.
+
+    The rows of a table are split into blocks of `SEED_BLOCK_SIZE` rows,
+    and each (table, attribute, block) has its own Philox stream, keyed
+    by a `SeedSequence`. So the values of a row don't depend on the chunk
+    size, on the number of workers or on the other tables and attributes,
+    and any chunk can be generated again on its own.
+    """
+
+    @staticmethod
+    def get_key(name: str) -> int:
+        return zlib.crc32(name.encode("utf-8"))
+
+    @staticmethod
+    def get_seed_sequence(
+        seed: int, class_name: str, key: str, block: int
+    ) -> np.random.SeedSequence:
+        return np.random.SeedSequence(
+            seed,
+            spawn_key=(
+                GenSeed.get_key(class_name),
+                GenSeed.get_key(key),
+                block,
+            ),
+        )
+
+    @staticmethod
+    def get_rng(
+        seed: int, class_name: str, key: str, block: int
+    ) -> np.random.Generator:
+        seed_seq = GenSeed.get_seed_sequence(seed, class_name, key, block)
+        return np.random.Generator(np.random.Philox(seed_seq))
+
+    @staticmethod
+    def get_int_seed(seed: int, class_name: str, key: str, block: int) -> int:
+        """
+        Return an integer seed, for the generators that don't accept a
+        NumPy generator (e.g. `random` and Faker).
+        """
+        seed_seq = GenSeed.get_seed_sequence(seed, class_name, key, block)
+        return int(seed_seq.generate_state(1, dtype=np.uint64)[0])
+
+    @staticmethod
+    def get_block(row: int) -> int:
+        """
+        Return the block of a row.
+        """
+        return row // SEED_BLOCK_SIZE
+
+    @staticmethod
+    def get_blocks(
+        start: int, rows: int, total: int
+    ) -> Iterator[Tuple[int, int, int]]:
+        """
+        Return `(block, block_start, block_rows)` for the blocks with the
+        rows from `start` to `start + rows`. The last block of a table
+        with `total` rows is shorter.
+        """
+        if rows <= 0:
+            return
+
+        first = GenSeed.get_block(start)
+        last = GenSeed.get_block(start + rows - 1)
+
+        for block in range(first, last + 1):
+            block_start = block * SEED_BLOCK_SIZE
+            yield block, block_start, min(SEED_BLOCK_SIZE, total - block_start)
+
+    @staticmethod
+    def generate(
+        seed: int,
+        class_name: str,
+        key: str,
+        start: int,
+        rows: int,
+        total: int,
+        func: Callable,
+    ):
+        """
+        Create the values for the rows from `start` to `start + rows`.
+
+        `func(block_rows, rng, block_start)` creates the values of a whole
+        block with its own stream, then just the requested rows are kept.
+        """
+        chunks = []
+
+        for block, block_start, block_rows in GenSeed.get_blocks(
+            start, rows, total
+        ):
+            rng = GenSeed.get_rng(seed, class_name, key, block)
+            values = func(block_rows, rng, block_start)
+
+            i_start = max(start - block_start, 0)
+            i_stop = min(start + rows - block_start, block_rows)
+            if i_start or i_stop < block_rows:
+                values = values[i_start:i_stop]
+            chunks.append(values)
+
+        if len(chunks) == 1:
+            return chunks[0]
+
+        if isinstance(chunks[0], pd.Categorical):
+            return pd.Categorical.from_codes(
+                np.concatenate([c.codes for c in chunks]),
+                dtype=chunks[0].dtype,
+            )
+
+        # note: e.g. the arrow strings of the text attributes
+        if isinstance(chunks[0], pd.api.extensions.ExtensionArray):
+            return type(chunks[0])._concat_same_type(chunks)
+
+        return np.concatenate(chunks)
@@ -0,0 +1,248 @@
+"""
+Module for bulk generation of text attributes.
+"""
+import string
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from faker import Faker
+
+from pydata_factory.config import DEFAULT_LOCALE, TEXT_POOL_SIZE
+
+
+class GenText:
+    """
+    Create text attributes from patterns, like
+    `"{first_name}.{last_name}@{domain}"`.
+
+    Each field is a Faker provider (e.g. `first_name`, `city`, `address`)
+    or `n`, the row number. A field can have filters, like
+    `{first_name|lower}`. The values of each provider are created just
+    once per locale, in a pool of `TEXT_POOL_SIZE` values, and the rows
+    are built by sampling the pools and joining the arrow string arrays,
+    instead of calling Faker once per row.
+    """
+
+    ALIASES = {"domain": "domain_name"}
+
+    FILTERS = {"lower": pc.utf8_lower, "upper": pc.utf8_upper}
+
+    _pools: Dict[Tuple[str, str], pa.Array] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_pattern(schema: dict, k_attr: str) -> Optional[str]:
+        """
+        Return the pattern of an attribute, given by its `pattern` key or
+        by its name (`address`, `name`, `first_name` and `last_name`).
+        """
+        col = schema["attributes"][k_attr]
+
+        if col.get("pattern"):
+            return col["pattern"]
+
+        return {
+            "address": "{address}",
+            "name": schema["name"] + "{n}",
+            "first_name": "FirstName{n}",
+            "last_name": "LastName{n}",
+        }.get(k_attr)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def parse(pattern: str) -> List[Tuple[str, Optional[str], List[str]]]:
+        """
+        Split a pattern in `(literal, field, filters)` parts.
+        """
+        parts: List[Tuple[str, Optional[str], List[str]]] = []
+
+        for literal, field, _, _ in string.Formatter().parse(pattern):
+            if field is None:
+                parts.append((literal, None, []))
+                continue
+
+            name, *filters = field.split("|")
+            for f in filters:
+                if f not in GenText.FILTERS:
+                    raise ValueError(
+                        f"Invalid filter: {f}. "
+                        f"Options: {', '.join(GenText.FILTERS)}."
+                    )
+            parts.append((literal, GenText.ALIASES.get(name, name), filters))
+
+        return parts
+
+    @staticmethod
+    def get_pool(provider: str, locale: str = DEFAULT_LOCALE) -> pa.Array:
+        """
+        Return the pool of values of a Faker provider.
+
+        The pool is created with its own seed, so it is the same in all
+        the processes.
+        """
+        key = (provider, locale)
+
+        with GenText._lock:
+            if key in GenText._pools:
+                return GenText._pools[key]
+
+            fake = Faker(locale)
+            fake.seed_instance(0)
+
+            try:
+                func = getattr(fake, provider)
+            except AttributeError:
+                raise ValueError(f"Invalid text field: {provider}.")
+
+            pool = pa.array(
+                [str(func()) for _ in range(TEXT_POOL_SIZE)], pa.string()
+            )
+            GenText._pools[key] = pool
+
+        return pool
+
+    @staticmethod
+    def get_unique_pool(
+        provider: str,
+        locale: str = DEFAULT_LOCALE,
+        filters: Sequence[str] = (),
+    ) -> pa.Array:
+        """
+        Return the distinct values of the pool of a Faker provider, after
+        its filters.
+        """
+        pool = GenText.get_pool(provider, locale)
+        for f in filters:
+            pool = GenText.FILTERS[f](pool)
+        return pc.unique(pool)
+
+    @staticmethod
+    def get_sizes(pattern: str, locale: str = DEFAULT_LOCALE) -> List[int]:
+        """
+        Return the number of distinct values of each field of a pattern
+        (see `GenText.generate_unique`).
+        """
+        return [
+            len(GenText.get_unique_pool(field, locale, filters))
+            for _, field, filters in GenText.parse(pattern)
+            if field is not None and field != "n"
+        ]
+
+    @staticmethod
+    def _join(
+        pattern: str, fields: list, rows: int, start: int = 0
+    ) -> pd.arrays.ArrowStringArray:
+        """
+        Join the literals of a pattern with the values of its fields.
+        """
+        arrays: list = []
+        i_field = 0
+
+        for literal, field, filters in GenText.parse(pattern):
+            if literal:
+                arrays.append(literal)
+
+            if field is None:
+                continue
+
+            if field == "n":
+                values = pc.cast(
+                    pa.array(np.arange(start, start + rows)), pa.string()
+                )
+            else:
+                values = fields[i_field]
+                i_field += 1
+
+            for f in filters:
+                values = GenText.FILTERS[f](values)
+
+            arrays.append(values)
+
+        if not any(isinstance(v, pa.Array) for v in arrays):
+            result = pa.repeat(pa.scalar("".join(arrays)), rows)
+        else:
+            result = pc.binary_join_element_wise(*arrays, "")
+
+        # note: the strings are kept in arrow, the column is converted just
+        #       when its dtype is not a string dtype (see `GenData._to_frame`)
+        return pd.arrays.ArrowStringArray(result)
+
+    @staticmethod
+    def generate(
+        pattern: str,
+        rows: int,
+        rng: np.random.Generator,
+        start: int = 0,
+        locale: str = DEFAULT_LOCALE,
+    ) -> pd.arrays.ArrowStringArray:
+        """
+        Create the values of a text attribute with its pattern, for the
+        rows from `start` to `start + rows`.
+        """
+        fields = []
+
+        for _, field, _ in GenText.parse(pattern):
+            if field is None or field == "n":
+                continue
+            pool = GenText.get_pool(field, locale)
+            fields.append(
+                pool.take(pa.array(rng.integers(0, len(pool), rows)))
+            )
+
+        return GenText._join(pattern, fields, rows, start)
+
+    @staticmethod
+    def generate_unique(
+        pattern: str, digits: list, rows: int, locale: str = DEFAULT_LOCALE
+    ) -> pd.arrays.ArrowStringArray:
+        """
+        Create the values of a text attribute from the position of each
+        field in its pool of distinct values (`digits`, one array per
+        field, see `GenText.get_sizes`). Distinct positions give distinct
+        combinations of the fields.
+        """
+        fields = []
+        i_field = 0
+
+        for _, field, filters in GenText.parse(pattern):
+            if field is None or field == "n":
+                continue
+            pool = GenText.get_unique_pool(field, locale, filters)
+            fields.append(pool.take(pa.array(digits[i_field])))
+            i_field += 1
+
+        return GenText._join(pattern, fields, rows)
+
+    @staticmethod
+    def format_value(
+        pattern: str, n: int, rnd, locale: str = DEFAULT_LOCALE
+    ) -> str:
+        """
+        Create the value of a text attribute for the row `n`, using the
+        random generator `rnd` (used by the factory classes).
+        """
+        value = ""
+
+        for literal, field, filters in GenText.parse(pattern):
+            value += literal
+
+            if field is None:
+                continue
+
+            if field == "n":
+                field_value = str(n)
+            else:
+                pool = GenText.get_pool(field, locale)
+                field_value = pool[rnd.randrange(len(pool))].as_py()
+
+            for f in filters:
+                field_value = getattr(field_value, f)()
+
+            value += field_value
+
+        return value
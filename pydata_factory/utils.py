@@ -23,16 +23,17 @@ def get_attr_name(attr_name: str):
 
 
 def normalize_datetime(value):
+    """
+    Format a datetime, keeping the fraction of the seconds (up to
+    nanoseconds) and the time zone offset. Naive datetimes at midnight are
+    formatted just as dates.
+    """
     if pd.isnull(value):
         return None
 
-    if isinstance(value, pd.Timestamp):
-        value = value.to_pydatetime()
+    value = pd.Timestamp(value)
 
-    # note: this logic needs to be improved
-    datetime_format = (
-        "%Y-%m-%d"
-        if not (value.hour or value.minute or value.second)
-        else "%Y-%m-%d %H:%M:%S"
-    )
-    return value.strftime(datetime_format)
+    if value.tzinfo is None and value == value.normalize():
+        return value.strftime("%Y-%m-%d")
+
+    return value.isoformat(sep=" ")
@@ -13,6 +13,7 @@ with open('HISTORY.rst') as history_file:
 
 requirements = [
     "factory-boy",
+    "numpy",
     "pandas",
     "pyarrow",
     "sqlalchemy",
@@ -38,6 +39,11 @@ setup(
         'Programming Language :: Python :: 3.8',
     ],
     description="Create data for testing from data files.",
+    entry_points={
+        'console_scripts': [
+            'pydata-factory=pydata_factory.cli:main',
+        ],
+    },
     install_requires=requirements,
     extras_require={'dev': dev_requirements},
     license="MIT license",
@@ -0,0 +1,33 @@
+"""Fixtures for the tests of `pydata_factory` package."""
+from pathlib import Path
+from typing import Sequence
+
+import pytest
+
+from pydata_factory.schema import Schema
+
+SCHEMAS_DIR = Path(__file__).parent / "data" / "schemas"
+
+
+@pytest.fixture
+def load_schemas():
+    """
+    Return a function that loads the test schemas by file name, with the
+    extra config file.
+    """
+
+    def load(
+        schema_names: Sequence[str] = ("clients", "projects", "tasks")
+    ) -> dict:
+        schemas = {}
+
+        for schema_name in schema_names:
+            schema = Schema.load_file(
+                SCHEMAS_DIR / f"{schema_name}.json",
+                SCHEMAS_DIR / "__extra-config__.json",
+            )
+            schemas[schema["name"]] = schema
+
+        return schemas
+
+    return load
@@ -0,0 +1,108 @@
+"""Tests for `pydata_factory` package."""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy as sqla
+
+from pydata_factory.cache import ProfileCache
+from pydata_factory.profiler import TableProfile
+from pydata_factory.schema import Schema
+
+
+def test_profile_cache_roundtrip(tmp_path):
+    """Test that the profiles are the same after loading the cache."""
+    df = pd.DataFrame(
+        {
+            "value": np.arange(100) * 1.5,
+            "kind": ["a", "b"] * 50,
+            "created": pd.date_range("2021-01-01", periods=100),
+        }
+    )
+    profile = TableProfile.from_batches([df])
+
+    cache = ProfileCache.load(str(tmp_path))
+    cache.set("key", {"size": 1}, profile)
+    cache.save()
+
+    cached = ProfileCache.load(str(tmp_path)).get("key", {"size": 1})
+
+    assert cached is not None
+    assert cached.to_dict() == profile.to_dict()
+    assert cached.columns["value"].std == pytest.approx(df["value"].std())
+    assert ProfileCache.load(str(tmp_path)).get("key", {"size": 2}) is None
+
+
+def test_schema_from_parquet_partitions_cache(tmp_path, monkeypatch):
+    """Test that just the new partition files are profiled."""
+    origin = tmp_path / "sales"
+    origin.mkdir()
+    target_dir = tmp_path / "schemas"
+
+    for i in range(2):
+        df = pd.DataFrame({"amount": np.arange(i * 10, i * 10 + 10)})
+        df.to_parquet(origin / f"part-{i}.parquet")
+
+    schema = Schema.from_parquet(str(origin), str(target_dir), cache=True)
+    assert schema["attributes"]["amount"]["max"] == 19
+
+    profiled = []
+    read_parquet_profile = Schema._read_parquet_profile
+
+    def spy(path, *args, **kwargs):
+        profiled.append(path)
+        return read_parquet_profile(path, *args, **kwargs)
+
+    monkeypatch.setattr(Schema, "_read_parquet_profile", spy)
+
+    pd.DataFrame({"amount": np.arange(20, 30)}).to_parquet(
+        origin / "part-2.parquet"
+    )
+    schema = Schema.from_parquet(str(origin), str(target_dir), cache=True)
+
+    assert profiled == [str(origin / "part-2.parquet")]
+    assert schema["attributes"]["amount"]["max"] == 29
+    assert schema["attributes"]["amount"]["mean"] == 14.5
+
+
+def test_schema_from_parquet_footer_only(tmp_path):
+    """Test the schema created just from the parquet footer."""
+    df = pd.DataFrame({"amount": np.arange(-5, 95)})
+    df.to_parquet(tmp_path / "sales.parquet", row_group_size=30)
+
+    schema = Schema.from_parquet(
+        str(tmp_path / "sales.parquet"), str(tmp_path), footer_only=True
+    )
+    amount = schema["attributes"]["amount"]
+
+    assert amount["min"] == -5
+    assert amount["max"] == 94
+    assert amount["count"] == 100
+
+
+def test_schema_from_sql_append_cache(tmp_path):
+    """Test that just the appended rows are read from the table."""
+    engine = sqla.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    df = pd.DataFrame({"id": np.arange(1, 101), "amount": np.arange(100)})
+    df.to_sql("sales", engine, index=False)
+
+    Schema.from_sql(engine, "sales", str(tmp_path), cache=True)
+
+    df = pd.DataFrame(
+        {"id": np.arange(101, 151), "amount": np.arange(100, 150)}
+    )
+    df.to_sql("sales", engine, index=False, if_exists="append")
+
+    schema = Schema.from_sql(engine, "sales", str(tmp_path), cache=True)
+    amount = schema["attributes"]["amount"]
+
+    assert amount["max"] == 149
+    assert amount["count"] == 150
+    assert amount["mean"] == 74.5
+
+    with open(tmp_path / "__cache__.json") as f:
+        entries = json.load(f)
+    (entry,) = entries.values()
+    assert entry["fingerprint"]["count"] == 150
+    assert entry["fingerprint"]["max-key"] == 150
@@ -0,0 +1,130 @@
+"""Tests for `pydata_factory` package."""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy as sqla
+
+from pydata_factory.cli import main
+
+SCHEMAS_DIR = Path(__file__).parent / "data" / "schemas"
+SCHEMA_FILES = [
+    str(SCHEMAS_DIR / f"{name}.json") for name in ["clients", "projects"]
+]
+
+
+def test_cli_help_lazy_imports():
+    """Test that the help doesn't import the heavy dependencies."""
+    script = (
+        "import sys\n"
+        "from pydata_factory import cli\n"
+        "try:\n"
+        "    cli.main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(any(m in sys.modules for m in ['pandas', 'sqlalchemy']))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).parent.parent,
+    )
+
+    assert "profile" in result.stdout
+    assert result.stdout.strip().endswith("False")
+
+
+def test_cli_profile(tmp_path, capsys):
+    """Test the creation of the schema of a parquet file."""
+    df = pd.DataFrame({"id": np.arange(1, 101), "amount": np.arange(100)})
+    df.to_parquet(tmp_path / "sales.parquet")
+
+    main(["profile", str(tmp_path / "sales.parquet"), str(tmp_path)])
+
+    assert capsys.readouterr().out.strip() == "sales"
+    with open(tmp_path / "sales.json") as f:
+        assert json.load(f)["attributes"]["amount"]["max"] == 99
+
+
+def test_cli_profile_dir(tmp_path, capsys):
+    """Test the schemas of a directory of parquet files."""
+    origin = Path(__file__).parent / "data" / "original"
+
+    main(["profile", str(origin), str(tmp_path / "tables")])
+    assert capsys.readouterr().out.split() == ["fb2021", "msft2021"]
+
+    main(["profile", str(origin), str(tmp_path / "one"), "--partitioned"])
+    assert capsys.readouterr().out.split() == ["original"]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "csv"])
+def test_cli_generate_files(tmp_path, capsys, fmt):
+    """Test the generation of the data files, with the progress."""
+    main(
+        ["generate", *SCHEMA_FILES, "--target-dir", str(tmp_path)]
+        + ["--format", fmt, "--scale", "3", "--chunk-size", "7"]
+    )
+
+    read = pd.read_parquet if fmt == "parquet" else pd.read_csv
+    df = read(tmp_path / f"projects.{fmt}")
+
+    assert df.shape[0] == 3 * 30
+    assert df["client_id"].isin(read(tmp_path / f"clients.{fmt}")["id"]).all()
+
+    progress = capsys.readouterr().err
+    assert "projects: 90/90 rows (100%)" in progress
+    assert "total:" in progress
+
+
+def test_cli_generate_sql_and_dry_run(tmp_path, capsys):
+    """Test the generation into a database and the estimate."""
+    url = f"sqlite:///{tmp_path / 'db.sqlite'}"
+
+    main(["generate", *SCHEMA_FILES, "--format", "sql", "--url", url])
+    main(["generate", *SCHEMA_FILES, "--dry-run", "--rows", "Client=50"])
+
+    engine = sqla.create_engine(url)
+    with engine.connect() as conn:
+        query = sqla.text("SELECT count(*) FROM clients")
+        assert conn.execute(query).scalar() == 10
+
+    estimate = json.loads(capsys.readouterr().out)
+    assert estimate["clients"]["rows"] == 50
+    assert estimate["projects"]["bytes"] > 0
+
+    with pytest.raises(SystemExit):
+        main(["generate", *SCHEMA_FILES, "--rows", "Client"])
+
+
+def test_cli_generate_priorities(tmp_path):
+    """Test the priorities of the extra config with other schemas."""
+    config_extra = tmp_path / "__extra-config__.json"
+    with open(SCHEMAS_DIR / "__extra-config__.json") as f:
+        config = json.load(f)
+    config["__config__"] = {"priorities": ["Task", "Project", "Client"]}
+    config_extra.write_text(json.dumps(config))
+
+    main(
+        ["generate", *SCHEMA_FILES, "--target-dir", str(tmp_path)]
+        + ["--config-extra", str(config_extra), "--quiet"]
+    )
+
+    assert (tmp_path / "clients.parquet").exists()
+    assert (tmp_path / "projects.parquet").exists()
+
+
+def test_cli_export(tmp_path):
+    """Test the module with the factory classes of the schemas."""
+    output = tmp_path / "factories.py"
+
+    main(["export", *SCHEMA_FILES, "--output", str(output)])
+
+    script = output.read_text()
+    assert "class ClientFactory" in script
+    assert "class ProjectFactory" in script
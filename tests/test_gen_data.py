@@ -1,8 +1,16 @@
 """Tests for `pydata_factory` package."""
+import sys
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
+import sqlalchemy as sqla
 
+from pydata_factory import classes
+from pydata_factory.classes import GenModule
 from pydata_factory.data import GenData
 from pydata_factory.schema import Schema
 
@@ -49,3 +57,568 @@ def test_gen_data_tasks_batch():
 
     for k, df in dfs.items():
         assert not df.empty
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_engine_layout(engine, load_schemas):
+    """Test that both engines create the same DataFrame layout."""
+    schemas = load_schemas(["clients", "projects"])
+    dfs = GenData.generate(schemas, rows={}, engine=engine)
+
+    for k_schema, schema in schemas.items():
+        df = dfs[Schema.get_qualified_name(schema)]
+        assert list(df.columns) == list(schema["attributes"].keys())
+        assert df.shape[0] == schema["attributes"]["id"]["count"]
+
+    clients = dfs["clients"]
+    projects = dfs["projects"]
+    assert projects["client_id"].isin(clients["id"]).all()
+    assert clients["client_type"].isin(["external", "internal"]).all()
+
+
+def test_gen_data_vectorized_custom_factory():
+    """Test the vectorized engine with a custom `__factory__` attribute."""
+    origin = Path(__file__).parent / "data" / "schemas" / "clients.json"
+    schema = Schema.load_file(origin)
+    schema["attributes"]["client_type"][
+        "__factory__"
+    ] = "factory.LazyAttribute(lambda o: o.name.upper())"
+    schemas = {schema["name"]: schema}
+
+    df = GenData.generate(schemas, rows={}, engine="vectorized")["clients"]
+
+    assert (df["client_type"] == df["name"].str.upper()).all()
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_custom_factory_foreign_key(engine, load_schemas):
+    """Test that a custom `__factory__` wins over the foreign-key index."""
+    schemas = load_schemas(["clients", "projects"])
+    schemas["Project"]["attributes"]["client_id"][
+        "__factory__"
+    ] = "factory.LazyAttribute(lambda o: 1)"
+
+    projects = GenData.generate(schemas, engine=engine)["projects"]
+
+    assert (projects["client_id"] == 1).all()
+
+
+def test_gen_data_invalid_engine():
+    """Test that an unknown engine is rejected."""
+    with pytest.raises(ValueError):
+        GenData.generate({}, engine="unknown")
+
+
+def test_gen_data_classes_cache():
+    """Test that the classes are built in memory just once per schemas."""
+    origin = Path(__file__).parent / "data" / "schemas" / "clients.json"
+    schema = Schema.load_file(origin)
+    schemas = {schema["name"]: schema}
+
+    sys_path = list(sys.path)
+    module = GenModule.load(schemas)
+
+    df1 = GenData.generate(schemas, rows={})["clients"]
+    df2 = GenData.generate(schemas, rows={})["clients"]
+
+    assert GenModule.load(schemas) is module
+    assert sys.path == sys_path
+    pd.testing.assert_frame_equal(df1, df2)
+
+
+def test_gen_data_classes_cache_eviction(monkeypatch):
+    """Test that the least recently used modules are evicted."""
+    monkeypatch.setattr(classes, "MODULE_CACHE_SIZE", 2)
+    origin = Path(__file__).parent / "data" / "schemas" / "clients.json"
+    modules = []
+
+    for n_rows in [10, 20, 30]:
+        schema = Schema.load_file(origin)
+        schema["attributes"]["id"]["count"] = n_rows
+        modules.append(GenModule.load({schema["name"]: schema}))
+
+    assert len(GenModule._cache) == 2
+    assert modules[0].__name__ not in sys.modules
+    assert all(m.__name__ in sys.modules for m in modules[1:])
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_foreign_keys(engine, load_schemas):
+    """Test that the foreign keys are drawn from the parent tables."""
+    schemas = load_schemas()
+
+    dfs = GenData.generate(schemas, rows={"Task": 200}, engine=engine)
+
+    projects = dfs["projects"].set_index("id")
+    tasks = dfs["tasks"]
+
+    assert tasks["project_id"].isin(projects.index).all()
+    # attributes that depend on the same parent come from the same row
+    assert (
+        projects.loc[tasks["project_id"], "client_id"].values
+        == tasks["client_id"].values
+    ).all()
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_iter_generate_chunks(engine, load_schemas):
+    """Test the generation of the data in chunks."""
+    schemas = load_schemas(["clients", "projects"])
+
+    chunks: dict = {}
+
+    for qualified_name, df in GenData.iter_generate(
+        schemas, rows={"Project": 25}, chunk_size=10, engine=engine
+    ):
+        assert df.shape[0] <= 10
+        chunks.setdefault(qualified_name, []).append(df)
+
+    assert list(chunks.keys()) == ["clients", "projects"]
+    assert [df.shape[0] for df in chunks["projects"]] == [10, 10, 5]
+
+    clients = pd.concat(chunks["clients"])
+    projects = pd.concat(chunks["projects"])
+
+    assert projects["id"].tolist() == list(range(1, 26))
+    assert projects["client_id"].isin(clients["id"]).all()
+
+
+def test_gen_data_to_parquet(tmp_path, load_schemas):
+    """Test writing the fake data directly to parquet files."""
+    schemas = load_schemas(["clients", "projects"])
+
+    paths = GenData.to_parquet(
+        schemas,
+        str(tmp_path),
+        rows={"Project": 25},
+        row_group_size=10,
+        engine="vectorized",
+    )
+
+    assert list(paths.keys()) == ["clients", "projects"]
+
+    metadata = pq.ParquetFile(paths["projects"]).metadata
+    assert metadata.num_rows == 25
+    assert metadata.num_row_groups == 3
+
+    table = pq.read_table(paths["projects"])
+    assert pa.types.is_dictionary(table.schema.field("project_type").type)
+    assert table.column_names == list(schemas["Project"]["attributes"])
+
+
+def test_gen_data_to_sql(tmp_path, load_schemas):
+    """Test loading the fake data into a database."""
+    schemas = load_schemas(["clients", "projects"])
+
+    engine = sqla.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    written = GenData.to_sql(
+        engine, schemas, rows={"Project": 25}, chunk_size=10, batch_size=4
+    )
+
+    assert written == {"clients": 10, "projects": 25}
+
+    projects = pd.read_sql("SELECT * FROM projects", con=engine)
+    assert projects.shape[0] == 25
+    assert projects["client_id"].isin(range(1, 11)).all()
+
+    with pytest.raises(ValueError):
+        GenData.to_sql(engine, schemas)
+
+    written = GenData.to_sql(engine, schemas, if_exists="replace")
+    assert pd.read_sql("SELECT * FROM projects", con=engine).shape[0] == 30
+
+
+def test_gen_data_to_sql_namespaces(tmp_path):
+    """Test the tables with the same name in different namespaces."""
+    engine = sqla.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+
+    @sqla.event.listens_for(engine, "connect")
+    def attach(dbapi_conn, record):
+        for namespace in ["a", "b"]:
+            dbapi_conn.execute(
+                f"ATTACH DATABASE '{tmp_path / namespace}.sqlite' "
+                f"AS {namespace}"
+            )
+
+    clients = pd.DataFrame({"id": np.arange(1, 11), "age": np.arange(10)})
+    projects = pd.DataFrame(
+        {"id": np.arange(1, 21), "client_id": np.arange(20) % 10 + 1}
+    )
+    schemas = {}
+    for namespace in ["a", "b"]:
+        schema = Schema.get_schema(clients, "clients", namespace)
+        schema["primary-key"] = ["id"]
+        schemas[schema["name"]] = schema
+    schema = Schema.get_schema(projects, "projects", "a")
+    schema["attributes"]["client_id"]["depends-on"] = "ClientA.id"
+    schemas[schema["name"]] = schema
+
+    written = GenData.to_sql(engine, schemas, gen_engine="vectorized")
+    GenData.to_sql(engine, schemas, if_exists="replace")
+
+    assert written == {"a.clients": 10, "b.clients": 10, "a.projects": 20}
+    assert pd.read_sql("SELECT * FROM b.clients", engine).shape[0] == 10
+    foreign_keys = sqla.inspect(engine).get_foreign_keys("projects", "a")
+    assert foreign_keys[0]["referred_schema"] == "a"
+    assert foreign_keys[0]["referred_table"] == "clients"
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_workers(engine, load_schemas):
+    """Test that the result doesn't depend on the number of workers."""
+    schemas = load_schemas()
+
+    rows = {"Client": 20, "Project": 50, "Task": 120}
+
+    dfs_serial = GenData.generate(
+        schemas, rows=rows, engine=engine, chunk_size=16
+    )
+    dfs_parallel = GenData.generate(
+        schemas, rows=rows, engine=engine, chunk_size=16, workers=3
+    )
+
+    assert list(dfs_serial.keys()) == list(dfs_parallel.keys())
+
+    for qualified_name, df in dfs_serial.items():
+        pd.testing.assert_frame_equal(df, dfs_parallel[qualified_name])
+
+    assert dfs_serial["tasks"].shape[0] == 120
+
+
+def test_gen_data_fk_index_files(tmp_path):
+    """Test the fk index sent to the workers as memory mapped files."""
+    index = {
+        "id": np.arange(1, 101),
+        "name": np.array([f"name-{i}" for i in range(100)], dtype=object),
+    }
+
+    fk_files = {"Client": GenData._save_fk_index(index, tmp_path, "Client")}
+    fk_index = GenData._open_fk_index(fk_files)
+
+    assert isinstance(fk_index["Client"]["id"], np.memmap)
+    np.testing.assert_array_equal(fk_index["Client"]["id"], index["id"])
+    np.testing.assert_array_equal(fk_index["Client"]["name"], index["name"])
+    assert GenData._open_fk_index(fk_files)["Client"]["id"] is (
+        fk_index["Client"]["id"]
+    )
+
+
+def test_gen_data_wrong_priorities(load_schemas):
+    """Test that the parents are generated before their children."""
+    schemas = load_schemas(["tasks", "projects", "clients"])
+
+    dfs = GenData.generate(schemas, rows={}, priorities=list(schemas))
+
+    assert list(dfs.keys()) == ["clients", "projects", "tasks"]
+    assert dfs["tasks"]["project_id"].isin(dfs["projects"]["id"]).all()
+
+    with pytest.raises(ValueError, match="unknown schemas: User"):
+        GenData.generate(schemas, priorities=list(schemas) + ["User"])
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_numeric_distribution(engine):
+    """Test that the numeric values follow the profiled distribution."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "id": np.arange(1, 5001),
+            "price": rng.lognormal(3, 1, size=5000),
+            "amount": rng.normal(100, 10, size=5000).round().astype(int),
+        }
+    )
+    schema = Schema.get_schema(df, "sales")
+    schemas = {schema["name"]: schema}
+
+    result = GenData.generate(schemas, engine=engine)["sales"]
+
+    price = result["price"]
+    assert price.dtype == "float64"
+    assert (price % 1 != 0).any()
+    assert price.median() == pytest.approx(df["price"].median(), rel=0.15)
+    assert price.min() >= df["price"].min()
+    assert price.max() <= df["price"].max()
+
+    amount = result["amount"]
+    assert amount.dtype == "int64"
+    assert amount.mean() == pytest.approx(100, abs=2)
+    assert amount.std() == pytest.approx(10, rel=0.15)
+
+    # note: without quantiles, it uses the truncated normal distribution
+    del schema["attributes"]["amount"]["quantiles"]
+    amount = GenData.generate(schemas, engine=engine)["sales"]["amount"]
+    assert amount.min() >= df["amount"].min()
+    assert amount.mean() == pytest.approx(100, abs=2)
+    assert amount.std() == pytest.approx(10, rel=0.15)
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_weighted_categories(engine):
+    """Test that the categories follow the profiled frequencies."""
+    df = pd.DataFrame(
+        {
+            "id": np.arange(1, 5001),
+            "kind": ["a"] * 3500 + ["b"] * 1000 + ["c"] * 500,
+        }
+    )
+    schema = Schema.get_schema(df, "sales")
+    schemas = {schema["name"]: schema}
+
+    kind = GenData.generate(schemas, engine=engine)["sales"]["kind"]
+
+    assert isinstance(kind.dtype, pd.CategoricalDtype)
+    assert list(kind.cat.categories) == ["a", "b", "c"]
+
+    frequencies = kind.value_counts(normalize=True)
+    assert frequencies["a"] == pytest.approx(0.7, abs=0.03)
+    assert frequencies["b"] == pytest.approx(0.2, abs=0.03)
+    assert frequencies["c"] == pytest.approx(0.1, abs=0.03)
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_compact(engine):
+    """Test the generation with the narrowest dtypes."""
+    df = pd.DataFrame(
+        {
+            "id": np.arange(1, 1001),
+            "quantity": np.arange(1000) % 100,
+            "amount": np.arange(1000) * 50,
+            "kind": ["a", "b"] * 500,
+            "code": [f"code{i}" for i in range(1000)],
+        }
+    )
+    schema = Schema.get_schema(df, "sales")
+    schemas = {schema["name"]: schema}
+
+    result = GenData.generate(schemas, engine=engine)["sales"]
+    result_compact = GenData.generate(schemas, engine=engine, compact=True)[
+        "sales"
+    ]
+
+    assert result_compact["id"].dtype == "int64"
+    assert result_compact["quantity"].dtype == "int8"
+    assert result_compact["amount"].dtype == "int32"
+    assert isinstance(result_compact["kind"].dtype, pd.CategoricalDtype)
+    assert result_compact["code"].dtype == "string[pyarrow]"
+    assert (
+        result_compact.memory_usage(deep=True).sum()
+        < result.memory_usage(deep=True).sum()
+    )
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_rows_not_deduplicated(engine):
+    """Test that the repeated rows are kept, with the schema dtypes."""
+    df = pd.DataFrame({"kind": ["a", "b"] * 50, "quantity": [1] * 100})
+    schema = Schema.get_schema(df, "sales")
+    schemas = {schema["name"]: schema}
+
+    result = GenData.generate(schemas, engine=engine, chunk_size=30)["sales"]
+
+    assert result.shape[0] == 100
+    assert list(result.columns) == ["kind", "quantity"]
+    assert isinstance(result["kind"].dtype, pd.CategoricalDtype)
+    assert result["quantity"].dtype == "int64"
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_fan_out(engine):
+    """Test that the children per parent follow the profiled fan-out."""
+    rng = np.random.default_rng(0)
+    # note: 10 projects with 300 tasks and 190 with 5 tasks
+    counts = np.where(np.arange(200) < 10, 300, 5)
+    df_projects = pd.DataFrame({"id": np.arange(1, 201)})
+    df_tasks = pd.DataFrame(
+        {
+            "id": np.arange(1, counts.sum() + 1),
+            "project_id": rng.permutation(
+                np.repeat(np.arange(1, 201), counts)
+            ),
+        }
+    )
+    schemas = {}
+    for df, name in [(df_projects, "projects"), (df_tasks, "tasks")]:
+        schema = Schema.get_schema(df, name)
+        schemas[schema["name"]] = schema
+
+    assert schemas["Task"]["attributes"]["project_id"]["fan-out"][-1] == 300
+
+    dfs = GenData.generate(schemas, engine=engine, chunk_size=1000)
+    result = dfs["tasks"]["project_id"].value_counts()
+
+    assert result.sum() == counts.sum()
+    assert result.max() > 100
+    assert result.median() < 20
+
+    dfs_single = GenData.generate(schemas, engine=engine, chunk_size=None)
+    pd.testing.assert_frame_equal(dfs["tasks"], dfs_single["tasks"])
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_scale(engine, load_schemas):
+    """Test the rows and the ranges multiplied by a scale factor."""
+    schemas = load_schemas()
+
+    rows = GenData.get_rows(schemas)
+    estimate = GenData.estimate(
+        schemas, engine=engine, scale=3, sample_rows=20
+    )
+    dfs = GenData.generate(schemas, engine=engine, scale=3)
+
+    for k_schema, schema in schemas.items():
+        qualified_name = Schema.get_qualified_name(schema)
+        df = dfs[qualified_name]
+
+        assert df.shape[0] == 3 * rows[k_schema]
+        assert df["id"].max() == 3 * rows[k_schema]
+        assert estimate[qualified_name]["rows"] == df.shape[0]
+        assert estimate[qualified_name]["bytes"] == pytest.approx(
+            df.memory_usage(deep=True).sum(), rel=0.25
+        )
+        assert estimate[qualified_name]["seconds"] > 0
+
+    assert dfs["tasks"]["project_id"].isin(dfs["projects"]["id"]).all()
+    # note: the schemas are not changed
+    assert GenData.get_rows(schemas) == rows
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_scale_zero_based_ids(engine):
+    """Test that the scale keeps the first id of zero-based ids."""
+    df = pd.DataFrame({"id": np.arange(100), "amount": np.arange(100)})
+    schema = Schema.get_schema(df, "sales")
+    schemas = {schema["name"]: schema}
+
+    ids = GenData.generate(schemas, engine=engine)["sales"]["id"]
+    ids_scaled = GenData.generate(schemas, engine=engine, scale=2)["sales"][
+        "id"
+    ]
+
+    assert ids.tolist() == list(range(100))
+    assert ids_scaled.tolist() == list(range(200))
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_chunk_size_independent(engine, monkeypatch, load_schemas):
+    """Test that the result doesn't depend on the chunk size."""
+    monkeypatch.setattr("pydata_factory.seeds.SEED_BLOCK_SIZE", 32)
+
+    schemas = load_schemas()
+
+    rows = {"Client": 20, "Project": 50, "Task": 120}
+
+    dfs = GenData.generate(schemas, rows=rows, engine=engine, chunk_size=None)
+
+    for chunk_size in [7, 32, 50]:
+        dfs_chunks = GenData.generate(
+            schemas, rows=rows, engine=engine, chunk_size=chunk_size
+        )
+        for qualified_name, df in dfs.items():
+            pd.testing.assert_frame_equal(df, dfs_chunks[qualified_name])
+
+    # note: a table without dependencies can be generated on its own
+    clients = GenData.generate(
+        {"Client": schemas["Client"]}, rows=rows, engine=engine
+    )["clients"]
+    pd.testing.assert_frame_equal(clients, dfs["clients"])
+
+    dfs_other = GenData.generate(schemas, rows=rows, engine=engine, seed=7)
+    assert not dfs_other["tasks"].equals(dfs["tasks"])
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_datetime(engine, load_schemas):
+    """Test the datetimes with time of the day and ordering constraint."""
+    schemas = load_schemas()
+
+    rows = {"Client": 10, "Project": 20, "Task": 500}
+    tasks = GenData.generate(schemas, rows=rows, engine=engine)["tasks"]
+
+    assert str(tasks["plan_date_start"].dt.tz) == "UTC"
+    assert (tasks["plan_date_end"] >= tasks["plan_date_start"]).all()
+    assert (tasks["plan_date_start"].dt.hour > 0).any()
+    assert tasks["plan_date_end"].max() <= pd.Timestamp(
+        "2021-06-30 23:59:59", tz="UTC"
+    )
+
+    # note: naive datetimes keep the physical dtype
+    df = pd.DataFrame(
+        {
+            "id": [1, 2],
+            "created": pd.to_datetime(
+                ["2021-01-01 10:30:00.5", "2021-01-02 08:00:00.0"]
+            ).as_unit("ns"),
+        }
+    )
+    schema = Schema.get_schema(df, "events")
+    assert (
+        schema["attributes"]["created"]["min"] == "2021-01-01 10:30:00.500000"
+    )
+
+    events = GenData.generate({"Event": schema}, engine=engine)["events"]
+    assert events["created"].dtype == "datetime64[ns]"
+    assert events["created"].min() >= pd.Timestamp("2021-01-01 10:30:00.5")
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_null_ranges(engine):
+    """Test the attributes whose profiled min and max are null."""
+    df = pd.DataFrame(
+        {
+            "id": np.arange(1, 51),
+            "low": np.arange(50),
+            "high": np.full(50, np.nan),
+            "client_id": np.full(50, np.nan),
+        }
+    )
+    schema = Schema.get_schema(df, "ranges")
+    schema["attributes"]["high"]["after"] = "low"
+    schema["attributes"]["code"] = {
+        "dtype": "int",
+        "min": None,
+        "max": None,
+        "unique": True,
+    }
+    schema["unique"] = [["client_id"]]
+    clients = {
+        "name": "Client",
+        "physical-name": "clients",
+        "attributes": {"id": {"dtype": "int", "min": None, "max": None}},
+    }
+    schemas = {"Range": schema, "Client": clients}
+
+    ranges = GenData.generate(
+        schemas, rows={"Range": 50}, priorities=["Range"], engine=engine
+    )["ranges"]
+
+    assert (ranges["high"] >= ranges["low"]).all()
+    assert ranges["client_id"].between(1, 9999).all()
+    assert ranges["client_id"].is_unique
+    assert ranges["code"].between(0, 9999).all() and ranges["code"].is_unique
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_numeric_after(engine):
+    """Test the numeric attributes placed after another attribute."""
+    schema = {
+        "name": "Range",
+        "physical-name": "ranges",
+        "attributes": {
+            "id": {"dtype": "int", "min": 1, "count": 500},
+            "low": {"dtype": "int", "min": 0, "max": 2},
+            "high": {
+                "dtype": "float",
+                "min": 0,
+                "max": 50,
+                "quantiles": [0, 1, 2, 50],
+                "after": "low",
+            },
+        },
+    }
+
+    df = GenData.generate({"Range": schema}, engine=engine)["ranges"]
+
+    assert (df["high"] >= df["low"]).all()
+    assert (df["high"] <= 50).all()
+    # note: the position follows the quantiles in both engines
+    assert (df["high"] < 10).mean() > 0.5
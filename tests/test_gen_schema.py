@@ -1,6 +1,7 @@
 """Tests for `pydata_factory` package."""
 from pathlib import Path
 
+import pandas as pd
 import pytest
 import sqlalchemy as sqla
 
@@ -8,10 +9,10 @@ from pydata_factory.schema import Schema
 
 
 @pytest.mark.parametrize("filename", ["fb2021.parquet", "msft2021.parquet"])
-def test_schema_from_parquet(filename):
+def test_schema_from_parquet(filename, tmp_path):
     """Test the creation of a new model from a parquet file."""
     origin = Path(__file__).parent / "data" / "original" / filename
-    target_dir = Path(__file__).parent / "data" / "schemas"
+    target_dir = tmp_path
     schema = Schema.from_parquet(str(origin), str(target_dir))
 
     assert isinstance(schema, dict)
@@ -21,10 +22,10 @@ def test_schema_from_parquet(filename):
 
 
 @pytest.mark.parametrize("filename", ["db.sqlite"])
-def test_schema_from_sql(filename):
+def test_schema_from_sql(filename, tmp_path):
     """Test the creation of a new model from a parquet file."""
     origin = Path(__file__).parent / "data" / "original" / filename
-    target_dir = Path(__file__).parent / "data" / "schemas"
+    target_dir = tmp_path
     engine = sqla.create_engine(f"sqlite:///{origin}")
     schema = Schema.from_sql(
         engine=engine, table_name="fb2021", target_dir=str(target_dir)
@@ -37,10 +38,10 @@ def test_schema_from_sql(filename):
 
 
 @pytest.mark.parametrize("filename", ["fb2021.parquet", "msft2021.parquet"])
-def test_schema_from_parquet_with_namespace(filename):
+def test_schema_from_parquet_with_namespace(filename, tmp_path):
     """Test the creation of a new model from a parquet file."""
     origin = Path(__file__).parent / "data" / "original" / filename
-    target_dir = Path(__file__).parent / "data" / "schemas"
+    target_dir = tmp_path
 
     namespace = "pydf"
 
@@ -91,3 +92,171 @@ def test_schemas_tasks_with_extra_config(schema_file, extra_config):
         for k_prop, v_prop in v_attr.items():
             assert k_prop in schema["attributes"][k_attr]
             assert v_prop == schema["attributes"][k_attr][k_prop]
+
+
+def test_schemas_topological_order():
+    """Test the order of the schemas from the `depends-on` attributes."""
+    origin_dir = Path(__file__).parent / "data" / "schemas"
+    config_extra_file = origin_dir / "__extra-config__.json"
+    schemas = {}
+
+    for schema_name in ["tasks", "projects", "clients", "fb2021"]:
+        schema = Schema.load_file(
+            str(origin_dir / f"{schema_name}.json"), config_extra_file
+        )
+        schemas[schema["name"]] = schema
+
+    assert Schema.get_levels(schemas) == [
+        ["Client", "Fb2021Pydf"],
+        ["Project"],
+        ["Task"],
+    ]
+    assert Schema.sort_topologically(
+        schemas, ["Fb2021Pydf", "Task", "Project", "Client"]
+    ) == ["Fb2021Pydf", "Client", "Project", "Task"]
+
+
+def test_schemas_cyclic_dependency():
+    """Test that a cyclic dependency is detected."""
+    origin_dir = Path(__file__).parent / "data" / "schemas"
+    config_extra_file = origin_dir / "__extra-config__.json"
+    schemas = {}
+
+    for schema_name in ["clients", "projects"]:
+        schema = Schema.load_file(
+            str(origin_dir / f"{schema_name}.json"), config_extra_file
+        )
+        schemas[schema["name"]] = schema
+
+    schemas["Client"]["attributes"]["id"]["depends-on"] = "Project.client_id"
+
+    with pytest.raises(ValueError, match="Cyclic dependency"):
+        Schema.get_levels(schemas)
+
+
+def test_schema_from_parquet_max_rows(tmp_path):
+    """Test the creation of a schema reading just some rows."""
+    origin = Path(__file__).parent / "data" / "original" / "fb2021.parquet"
+    schema = Schema.from_parquet(
+        str(origin), str(tmp_path), max_rows=50, batch_size=20
+    )
+
+    assert schema["attributes"]["high"]["count"] == 50
+
+
+def test_schema_from_sql_sample(tmp_path):
+    """Test the creation of a schema from a sample of a table."""
+    origin = Path(__file__).parent / "data" / "original" / "db.sqlite"
+    engine = sqla.create_engine(f"sqlite:///{origin}")
+    schema = Schema.from_sql(
+        engine=engine,
+        table_name="fb2021",
+        target_dir=str(tmp_path),
+        sample=0.5,
+        batch_size=20,
+    )
+
+    assert 0 < schema["attributes"]["high"]["count"] < 250
+
+
+def test_schema_from_sql_pushdown(tmp_path):
+    """Test the creation of a schema computed by the database."""
+    origin = Path(__file__).parent / "data" / "original" / "db.sqlite"
+    engine = sqla.create_engine(f"sqlite:///{origin}")
+
+    schema = Schema.from_sql(
+        engine=engine,
+        table_name="fb2021",
+        target_dir=str(tmp_path / "pushdown"),
+        pushdown=True,
+    )
+    expected = Schema.from_sql(
+        engine=engine, table_name="fb2021", target_dir=str(tmp_path)
+    )
+
+    attrs = schema["attributes"]
+    assert attrs["date"]["dtype"] == "datetime"
+    assert attrs["date"]["min"] == "2021-01-04"
+
+    for k_attr in ["high", "volume"]:
+        for k_prop in ["min", "max", "mean", "std", "count"]:
+            assert attrs[k_attr][k_prop] == pytest.approx(
+                expected["attributes"][k_attr][k_prop]
+            )
+
+
+@pytest.mark.parametrize("pushdown", [False, True])
+def test_schema_from_database(tmp_path, pushdown):
+    """Test the creation of the schemas for all the tables of a database."""
+    engine = sqla.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+
+    with engine.begin() as conn:
+        conn.execute(
+            sqla.text("CREATE TABLE clients (id INTEGER PRIMARY KEY)")
+        )
+        conn.execute(
+            sqla.text(
+                "CREATE TABLE projects ("
+                "id INTEGER PRIMARY KEY, "
+                "owner INTEGER REFERENCES clients (id))"
+            )
+        )
+        conn.execute(sqla.text("INSERT INTO clients VALUES (1), (2)"))
+        conn.execute(sqla.text("INSERT INTO projects VALUES (1, 1)"))
+
+    schemas = Schema.from_database(
+        engine, str(tmp_path), workers=2, pushdown=pushdown
+    )
+
+    assert list(schemas.keys()) == ["Client", "Project"]
+    assert schemas["Project"]["attributes"]["owner"]["depends-on"] == (
+        "Client.id"
+    )
+
+    bundle_file = str(tmp_path / "__schemas__.json")
+    assert Schema.load_bundle(bundle_file) == schemas
+    assert Schema.get_priorities(bundle_file) == ["Client", "Project"]
+
+
+def test_schema_from_parquet_dir(tmp_path):
+    """Test the creation of the schemas for a directory of parquet files."""
+    origin_dir = Path(__file__).parent / "data" / "original"
+
+    schemas = Schema.from_parquet_dir(
+        str(origin_dir), str(tmp_path), namespace="pydf"
+    )
+
+    assert list(schemas.keys()) == ["Fb2021Pydf", "Msft2021Pydf"]
+    assert Schema.load_bundle(str(tmp_path / "__schemas__.json")) == schemas
+
+
+def test_schema_categories_frequencies():
+    """Test that the low cardinality columns get weighted categories."""
+    df = pd.DataFrame(
+        {
+            "kind": ["a"] * 70 + ["b"] * 20 + ["c"] * 10,
+            "code": [f"code{i}" for i in range(100)],
+        }
+    )
+    schema = Schema.get_schema(df, "sales")
+    kind = schema["attributes"]["kind"]
+
+    assert kind["categories"] == ["a", "b", "c"]
+    assert kind["frequencies"] == pytest.approx([0.7, 0.2, 0.1])
+    assert "categories" not in schema["attributes"]["code"]
+
+
+def test_schema_int_distribution():
+    """Test that the distribution of the int columns is not truncated."""
+    amount = pd.Series([0] * 30 + [1] * 30 + [2] * 20 + [10] * 15 + [42] * 5)
+    df = pd.DataFrame({"amount": amount})
+    schema = Schema.get_schema(df, "sales")
+    attr = schema["attributes"]["amount"]
+
+    assert isinstance(attr["min"], int) and isinstance(attr["max"], int)
+    assert attr["mean"] == pytest.approx(amount.mean())
+    assert attr["std"] == pytest.approx(amount.std())
+    assert all(isinstance(v, float) for v in attr["quantiles"])
+    assert attr["quantiles"] == pytest.approx(
+        amount.quantile([i / 20 for i in range(21)]).tolist(), abs=1
+    )
@@ -0,0 +1,87 @@
+"""Tests for `pydata_factory` package."""
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy as sqla
+
+from pydata_factory.data import GenData
+from pydata_factory.keys import GenKey
+from pydata_factory.schema import Schema
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 100, 4097])
+def test_key_permute(size):
+    """Test that the positions are permuted in the same range."""
+    keys = np.array([1, 2, 3, 4], dtype=np.uint64)
+    result = GenKey.permute(np.arange(size), size, keys)
+
+    assert sorted(result) == list(range(size))
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_composite_key(engine, load_schemas):
+    """Test the generation of a composite key with a foreign key."""
+    schemas = load_schemas()
+    schemas["Task"]["unique"] = [["project_id", "task_type"]]
+    rows = {"Client": 20, "Project": 50, "Task": 200}
+
+    dfs = GenData.generate(schemas, rows=rows, engine=engine, chunk_size=16)
+    tasks = dfs["tasks"]
+    projects = dfs["projects"].set_index("id")
+
+    assert tasks.shape[0] == 200
+    assert not tasks.duplicated(["project_id", "task_type"]).any()
+    # note: the other foreign keys come from the same parent row
+    assert (
+        tasks["client_id"].to_numpy()
+        == projects.loc[tasks["project_id"], "client_id"].to_numpy()
+    ).all()
+
+    dfs_single = GenData.generate(
+        schemas, rows=rows, engine=engine, chunk_size=None
+    )
+    pd.testing.assert_frame_equal(tasks, dfs_single["tasks"])
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_unique_attributes(engine):
+    """Test the generation of unique integers and text patterns."""
+    df = pd.DataFrame(
+        {"code": np.arange(1000), "email": ["a@example.com"] * 1000}
+    )
+    schema = Schema.get_schema(df, "users")
+    schema["attributes"]["code"]["unique"] = True
+    schema["attributes"]["email"].update(
+        {"pattern": "{first_name|lower}.{last_name|lower}@{domain}"}
+    )
+    schema["unique"] = [["email"]]
+    schemas = {schema["name"]: schema}
+
+    result = GenData.generate(schemas, engine=engine, chunk_size=300)["users"]
+
+    assert sorted(result["code"]) == list(range(1000))
+    assert result["email"].is_unique
+
+    schema["attributes"]["code"]["max"] = 998
+    with pytest.raises(ValueError, match="less than 1000 rows"):
+        GenData.generate(schemas, engine=engine)
+
+
+def test_to_sql_keys(tmp_path, load_schemas):
+    """Test the unique keys written to and read from the database."""
+    schemas = load_schemas()
+    schemas["Task"]["unique"] = [["project_id", "task_type"]]
+    schemas["Client"]["primary-key"] = ["id"]
+    engine = sqla.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+
+    GenData.to_sql(
+        engine,
+        schemas,
+        rows={"Client": 20, "Project": 50, "Task": 200},
+        gen_engine="vectorized",
+    )
+
+    schemas_db = Schema.from_database(engine, str(tmp_path))
+
+    assert schemas_db["Client"]["primary-key"] == ["id"]
+    assert schemas_db["Task"]["unique"] == [["project_id", "task_type"]]
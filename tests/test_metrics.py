@@ -0,0 +1,84 @@
+"""Tests for `pydata_factory` package."""
+import json
+import logging
+
+import pytest
+
+from pydata_factory import metrics as metrics_module
+from pydata_factory.data import GenData
+from pydata_factory.metrics import GenMetrics, get_peak_rss
+
+
+@pytest.mark.parametrize(
+    "engine,workers",
+    [("factory", 1), ("vectorized", 1), ("vectorized", 2)],
+)
+def test_gen_metrics_stages(engine, workers, load_schemas):
+    """Test the events and the summary of the generation stages."""
+    schemas = load_schemas()
+    events = []
+
+    with GenMetrics(callback=events.append) as metrics:
+        GenData.generate(
+            schemas,
+            rows={"Client": 20, "Project": 50, "Task": 120},
+            engine=engine,
+            workers=workers,
+            chunk_size=16,
+            metrics=metrics,
+        )
+
+    assert events == metrics.events
+    assert events[-1]["stage"] == "total"
+
+    stages = {(e["table"], e["stage"]) for e in events}
+    columns_stage = "columns" if engine == "vectorized" else "factory-rows"
+    for stage in ["fk-values", columns_stage, "assembly", "shard"]:
+        assert ("tasks", stage) in stages
+    assert (None, "load-classes") in stages
+    assert ("tasks", "fk-index") in stages
+
+    summary = metrics.summary()
+    tasks = summary["tables"]["tasks"]
+
+    assert tasks["rows"] == 120
+    assert tasks["rows-per-second"] > 0
+    # note: the tasks have two foreign keys to the projects
+    assert tasks["fk-index"] == 240
+    assert tasks["fk-range"] == 0
+    assert summary["tables"]["clients"]["rows"] == 20
+
+
+def test_gen_metrics_log(tmp_path, caplog, load_schemas):
+    """Test the metrics written as JSON lines, with the write stage."""
+    schemas = load_schemas(["clients"])
+    metrics = GenMetrics(log=True)
+
+    with caplog.at_level(logging.INFO, logger="pydata_factory.metrics"):
+        GenData.to_parquet(
+            schemas,
+            str(tmp_path),
+            rows={"Client": 30},
+            row_group_size=10,
+            metrics=metrics,
+        )
+
+    events = [json.loads(r.getMessage()) for r in caplog.records]
+
+    assert events == metrics.events
+    assert [e["rows"] for e in events if e["stage"] == "write"] == [10] * 3
+    assert metrics.summary()["tables"]["clients"]["stages"]["write"] > 0
+
+
+@pytest.mark.parametrize(
+    "platform,expected", [("linux", 200 * 1024**2), ("darwin", 200 * 1024)]
+)
+def test_get_peak_rss_unit(platform, expected, monkeypatch):
+    """Test the unit of the peak memory by platform."""
+    usage = type("Usage", (), {"ru_maxrss": 200 * 1024})
+    monkeypatch.setattr(metrics_module.sys, "platform", platform)
+    monkeypatch.setattr(
+        metrics_module.resource, "getrusage", lambda who: usage
+    )
+
+    assert get_peak_rss() == expected
@@ -0,0 +1,138 @@
+"""Tests for `pydata_factory` package."""
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy as sqla
+
+from pydata_factory.profiler import HyperLogLog, TableProfile
+
+
+def test_hyperloglog_estimate():
+    """Test the estimation of the number of distinct values."""
+    hll = HyperLogLog()
+    values = pd.Series(np.arange(50_000) % 20_000)
+
+    for i in range(0, values.shape[0], 10_000):
+        hll.update(values.iloc[i : i + 10_000])
+
+    assert hll.estimate() == pytest.approx(20_000, rel=0.05)
+
+
+@pytest.mark.parametrize("batch_size", [7, 50, 1000])
+def test_table_profile_batches(batch_size):
+    """Test that the statistics don't depend on the batches."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "value": rng.normal(100, 15, size=1000),
+            "amount": rng.integers(-5, 500, size=1000),
+            "kind": rng.choice(["a", "b", "c"], size=1000),
+        }
+    )
+    df.loc[::10, "value"] = np.nan
+
+    batches = (df.iloc[i : i + batch_size] for i in range(0, 1000, batch_size))
+    profile = TableProfile.from_batches(batches)
+
+    value = profile.columns["value"]
+    assert value.count == df["value"].count()
+    assert value.min == df["value"].min()
+    assert value.mean == pytest.approx(df["value"].mean())
+    assert value.std == pytest.approx(df["value"].std())
+
+    amount = profile.columns["amount"]
+    assert amount.max == df["amount"].max()
+    assert amount.std == pytest.approx(df["amount"].std())
+
+    kind = profile.columns["kind"]
+    assert kind.value_counts == df["kind"].value_counts().to_dict()
+    assert kind.distinct == 3
+
+
+def test_table_profile_many_strings(monkeypatch):
+    """Test that the counts are not computed after too many values."""
+    df = pd.DataFrame({"name": [f"name-{i}" for i in range(5000)]})
+    calls = []
+    value_counts = pd.Series.value_counts
+
+    def spy(self, *args, **kwargs):
+        calls.append(self.shape[0])
+        return value_counts(self, *args, **kwargs)
+
+    monkeypatch.setattr(pd.Series, "value_counts", spy)
+    batches = (df.iloc[i : i + 600] for i in range(0, 5000, 600))
+    profile = TableProfile.from_batches(batches)
+
+    name = profile.columns["name"]
+    assert name.value_counts is None
+    assert name.count == 5000
+    # note: the counts are dropped after the second batch
+    assert calls == [600, 600]
+
+
+def test_table_profile_sample():
+    """Test the profiling with sample and max rows."""
+    df = pd.DataFrame({"value": np.arange(10_000)})
+    batches = (df.iloc[i : i + 1000] for i in range(0, 10_000, 1000))
+
+    profile = TableProfile.from_batches(batches, max_rows=2500)
+    assert profile.rows == 2500
+    assert profile.columns["value"].max == 2499
+
+    batches = (df.iloc[i : i + 1000] for i in range(0, 10_000, 1000))
+    profile = TableProfile.from_batches(batches, sample=0.1)
+    column = profile.columns["value"]
+    assert column.count < 2000
+    assert profile.get_count(column) == pytest.approx(10_000, rel=0.1)
+
+
+def test_table_profile_quantiles():
+    """Test the quantiles estimated from the sample of the values."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"value": rng.lognormal(3, 1, size=50_000)})
+
+    batches = (df.iloc[i : i + 5000] for i in range(0, 50_000, 5000))
+    profile = TableProfile.from_batches(batches)
+    quantiles = profile.columns["value"].quantiles
+
+    expected = np.quantile(df["value"], np.linspace(0, 1, len(quantiles)))
+    assert quantiles[0] == df["value"].min()
+    assert quantiles[-1] == df["value"].max()
+    assert quantiles[1:-1] == pytest.approx(expected[1:-1], rel=0.15)
+
+
+@pytest.mark.parametrize("batch_size", [100, 10_000])
+def test_fan_out_sketch(batch_size):
+    """Test the counts of the sampled values, merged across batches."""
+    rng = np.random.default_rng(0)
+    # note: parent `i` has `i % 10 + 1` children
+    values = np.repeat(np.arange(20_000), np.arange(20_000) % 10 + 1)
+    df = pd.DataFrame({"project_id": rng.permutation(values)})
+
+    profile = TableProfile.from_batches(
+        df.iloc[i : i + batch_size] for i in range(0, df.shape[0], batch_size)
+    )
+    sketch = profile.columns["project_id"].fan_out
+
+    assert sketch is not None
+    assert len(sketch.counts) <= 4096
+    assert set(sketch.counts.values()) == set(range(1, 11))
+    assert sketch.quantiles(3) == [1, pytest.approx(5.5, abs=1), 10]
+
+
+def test_table_profile_from_sql_connection(tmp_path):
+    """Test that the profiling doesn't change the options of the caller."""
+    df = pd.DataFrame(
+        {"id": np.arange(1, 101), "client_id": np.arange(100) % 7}
+    )
+    engine = sqla.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    df.to_sql("projects", engine, index=False)
+
+    with engine.connect() as conn:
+        profile = TableProfile.from_sql(
+            conn, "projects", key_columns=["client_id"]
+        )
+
+        assert "stream_results" not in conn.get_execution_options()
+
+    assert profile.columns["client_id"].fan_out is not None
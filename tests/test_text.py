@@ -0,0 +1,74 @@
+"""Tests for `pydata_factory` package."""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pydata_factory.data import GenData
+from pydata_factory.text import GenText
+
+
+def test_text_pattern():
+    """Test the text created from a pattern."""
+    pattern = "{first_name|lower}.{last_name|lower}{n}@{domain}"
+    rng = np.random.default_rng(0)
+
+    values = GenText.generate(pattern, 1000, rng, start=10)
+
+    assert isinstance(values, pd.arrays.ArrowStringArray)
+    assert values.shape == (1000,)
+    assert values[0].endswith(values[0].split("@")[1])
+    assert values[5].split("@")[0].endswith("15")
+    assert all(v == v.lower() for v in values)
+    assert all(v.count("@") == 1 for v in values)
+
+    np.testing.assert_array_equal(
+        values,
+        GenText.generate(pattern, 1000, np.random.default_rng(0), start=10),
+    )
+
+    value = GenText.format_value(pattern, 3, random.Random(0))
+    assert value.split("@")[0].endswith("3")
+
+
+def test_text_invalid_field():
+    """Test that the unknown fields and filters are rejected."""
+    rng = np.random.default_rng(0)
+
+    with pytest.raises(ValueError):
+        GenText.generate("{unknown_provider}", 10, rng)
+
+    with pytest.raises(ValueError):
+        GenText.generate("{first_name|title}", 10, rng)
+
+
+@pytest.mark.parametrize("engine", ["factory", "vectorized"])
+def test_gen_data_text_pattern(engine):
+    """Test the attributes with a pattern in both engines."""
+    schema = {
+        "name": "User",
+        "physical-name": "users",
+        "attributes": {
+            "id": {"dtype": "int", "min": 1, "count": 50},
+            "email": {
+                "dtype": "str",
+                "pattern": "{first_name|lower}.{last_name|lower}@{domain}",
+            },
+            "city": {"dtype": "str", "pattern": "{city}", "locale": "de_DE"},
+            "address": {"dtype": "str"},
+        },
+    }
+
+    df = GenData.generate({"User": schema}, engine=engine)["users"]
+
+    assert df.shape[0] == 50
+    assert df["email"].str.match(r"^[^@\sA-Z]+\.[^@\sA-Z]+@[^@\s]+$").all()
+    assert set(df["city"]) <= set(GenText.get_pool("city", "de_DE").tolist())
+    assert set(df["address"]) <= set(GenText.get_pool("address").tolist())
+
+    df_compact = GenData.generate(
+        {"User": schema}, engine=engine, compact=True, chunk_size=20
+    )["users"]
+    assert df_compact["email"].dtype == "string[pyarrow]"
+    assert df_compact["email"].tolist() == df["email"].tolist()